@@ -0,0 +1,32 @@
+#!/usr/bin/python3
+
+# command line driver for graphs stored in edge list files, e.g.
+#   ./disconnect-cli.py --graph edges.txt --s 2 --t 6
+#   ./disconnect-cli.py --graph edges.bin --binary --s 2 --t 6 --cut
+# text lines may carry a third column with the removal cost of the edge
+
+import argparse
+import disconnect
+
+parser = argparse.ArgumentParser(description="Minimal s-t edge cut of a graph file")
+parser.add_argument("--graph", required=True, help="edge list file")
+parser.add_argument("--s", type=int, required=True, help="starting node")
+parser.add_argument("--t", type=int, required=True, help="terminating node")
+parser.add_argument("--binary", action="store_true", help="file holds int32 pairs instead of text")
+parser.add_argument("--weighted", action="store_true", help="binary file holds (u, v, w) int32 triples")
+parser.add_argument("--cut", action="store_true", help="also print the edges to delete")
+parser.add_argument("--stats", action="store_true", help="print how much preprocessing shrank the graph")
+args = parser.parse_args()
+
+graph = disconnect.load_graph(args.graph, binary=args.binary, weighted=args.weighted)
+if args.stats and args.s in graph.index and args.t in graph.index and args.s != args.t:
+    _, _, stats = disconnect.reduce_graph(graph, graph.index[args.s], graph.index[args.t])
+    print("Vertices: {} -> {}".format(*stats["vertices"]))
+    print("Edges: {} -> {}".format(*stats["edges"]))
+num, cut = disconnect.find_minimal_cut(graph, args.s, args.t)
+
+print("Edges to delete:")
+print(num)
+if args.cut:
+    for edge in cut:
+        print(*edge)
@@ -1,74 +1,927 @@
-from z3 import Bool, And, Or, Solver, sat, is_true
+import mmap
+import multiprocessing
+import os
+import time
+from array import array
+from collections import deque
+from multiprocessing.connection import wait
+from z3 import Bool, Or, Not, PbLe, Optimize, SolverFor, sat, is_true
 
-graph = []
-vertices = []
+# reduce_graph only pays for itself when it removes at least 1/REDUCE_GAIN
+# of the edges: it leaves graphs with fewer dangling and degree-2 vertices
+# than that as they are, and stops reducing once a round removes less
+REDUCE_GAIN = 32
 
 
-def printAllPathsUtil(u, d, visited, path, beta):
-    global graph, vertices
-    # Mark the current node as visited and store in path
-    visited[u] = True
-    path.append(u)
+# Undirected graph in compressed sparse row form, shared by every algorithm
+# below. Vertex ids are relabelled to 0..n-1 (labels[u] is the original id of
+# u, index the reverse map) and edge i joins src[i] and dst[i]. The arcs
+# leaving u are offsets[u] .. offsets[u + 1] - 1; arc a goes to targets[a]
+# along edge edge_of[a], and twin[a] is the same edge in the other direction.
+# weight holds one capacity per edge, or is None when every edge counts 1.
+class Graph:
+    __slots__ = ("index", "labels", "src", "dst", "weight",
+                 "offsets", "targets", "edge_of", "twin")
 
-    # If current vertex is same as destination, then print
-    # current path[]
-    if u == d:
-        beta.append(path.copy())
+    def __len__(self):
+        return len(self.labels)
+
+    def neighbors(self, u):
+        return self.targets[self.offsets[u]:self.offsets[u + 1]]
+
+
+def empty_graph():
+    g = Graph()
+    g.index = {}
+    g.labels = []
+    g.src = array("i")
+    g.dst = array("i")
+    g.weight = None
+    return g
+
+
+# Relabel the vertices of an edge list and build its CSR adjacency; edges
+# are (u, v) pairs or (u, v, w) triples with an integer removal cost w
+def build_graph(edges):
+    g = empty_graph()
+    for edge in edges:
+        add_edge(g, *edge)
+    fill_adjacency(g)
+    return g
+
+
+# Stream an edge list file straight into a Graph without building per-edge
+# tuples: text files hold one "u v" or "u v w" line per edge ('#' starts a
+# comment), binary files are native int32 pairs (triples when weighted) and
+# are read through mmap in chunks
+def load_graph(path, binary=False, weighted=False, chunk_size=1 << 20):
+    g = empty_graph()
+    if binary:
+        width = 3 if weighted else 2
+        with open(path, "rb") as f:
+            size = f.seek(0, 2)
+            if size % (4 * width) != 0:
+                raise Exception("Truncated edge list")
+            if weighted:
+                g.weight = array("q")
+            if size == 0:
+                fill_adjacency(g)
+                return g
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Whole records only, at least one per chunk
+                step = max(chunk_size - chunk_size % (4 * width), 4 * width)
+                for off in range(0, size, step):
+                    ends = array("i")
+                    ends.frombytes(mm[off:off + step])
+                    for j in range(0, len(ends), width):
+                        add_edge(g, *ends[j:j + width])
     else:
-        # If current vertex is not destination
-        # Recur for all the vertices adjacent to this vertex
-        for i in graph[u]:
-            if visited[i] is False:
-                printAllPathsUtil(i, d, visited, path, beta)
+        with open(path, "r", buffering=chunk_size) as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                if not fields:
+                    continue
+                add_edge(g, *map(int, fields[:3]))
+    fill_adjacency(g)
+    return g
+
+
+def add_edge(g, a, b, w=None):
+    for v in (a, b):
+        if v not in g.index:
+            g.index[v] = len(g.labels)
+            g.labels.append(v)
+    g.src.append(g.index[a])
+    g.dst.append(g.index[b])
+    if w is not None and g.weight is None:
+        # First weighted edge: the earlier ones cost 1
+        g.weight = array("q", [1]) * (len(g.src) - 1)
+    if g.weight is not None:
+        if w is not None and w < 0:
+            raise Exception("Negative edge weight")
+        g.weight.append(1 if w is None else w)
+
+
+def as_graph(graph_):
+    if isinstance(graph_, Graph):
+        return graph_
+    return build_graph(graph_)
+
+
+# Residual capacities of a fresh flow: both arcs of an edge get its weight
+def capacities(g):
+    if g.weight is None:
+        return array("q", [1]) * len(g.targets)
+    cap = array("q", [0]) * len(g.targets)
+    for a in range(len(g.targets)):
+        cap[a] = g.weight[g.edge_of[a]]
+    return cap
+
+
+# Edge i with its original vertex ids (and weight, for weighted graphs)
+def edge_at(g, i):
+    if g.weight is not None:
+        return (g.labels[g.src[i]], g.labels[g.dst[i]], g.weight[i])
+    return (g.labels[g.src[i]], g.labels[g.dst[i]])
+
+
+def edge_weight(g, i):
+    return 1 if g.weight is None else g.weight[i]
+
+
+# Counting sort of the 2m arcs by their tail vertex
+def fill_adjacency(g):
+    n = len(g.labels)
+    m = len(g.src)
+    offsets = array("i", [0]) * (n + 1)
+    for u in g.src:
+        offsets[u + 1] += 1
+    for v in g.dst:
+        offsets[v + 1] += 1
+    for u in range(n):
+        offsets[u + 1] += offsets[u]
+    fill = array("i", offsets[:n])
+    targets = array("i", [0]) * (2 * m)
+    edge_of = array("i", [0]) * (2 * m)
+    twin = array("i", [0]) * (2 * m)
+    for i in range(m):
+        u = g.src[i]
+        v = g.dst[i]
+        a = fill[u]
+        fill[u] += 1
+        b = fill[v]
+        fill[v] += 1
+        targets[a] = v
+        targets[b] = u
+        edge_of[a] = i
+        edge_of[b] = i
+        twin[a] = b
+        twin[b] = a
+    g.offsets = offsets
+    g.targets = targets
+    g.edge_of = edge_of
+    g.twin = twin
 
-    # Remove current vertex from path[] and mark it as unvisited
-    path.pop()
-    visited[u] = False
 
+# Simple s-t paths (as lists of edge ids) generated lazily by a depth-first
+# search with an explicit stack, so neither deep graphs nor huge path counts
+# blow up the recursion limit or memory. max_length bounds the number of
+# edges of a path and max_count the number of paths produced.
+def iter_paths(g, s, t, max_length=None, max_count=None):
+    if s == t:
+        raise Exception("Unsat")
+    offsets = g.offsets
+    targets = g.targets
+    on_path = bytearray(len(g))
+    on_path[s] = 1
+    stack = [s]
+    it = [offsets[s]]
+    edges = []
+    count = 0
+    while stack:
+        u = stack[-1]
+        a = it[-1]
+        if a == offsets[u + 1]:
+            on_path[u] = 0
+            stack.pop()
+            it.pop()
+            if edges:
+                edges.pop()
+            continue
+        it[-1] = a + 1
+        v = targets[a]
+        if on_path[v]:
+            continue
+        if v == t:
+            if max_length is not None and len(edges) + 1 > max_length:
+                continue
+            yield edges + [g.edge_of[a]]
+            count += 1
+            if max_count is not None and count >= max_count:
+                return
+            continue
+        # Going through v needs at least one more edge to reach t
+        if max_length is not None and len(edges) + 2 > max_length:
+            continue
+        on_path[v] = 1
+        stack.append(v)
+        it.append(offsets[v])
+        edges.append(g.edge_of[a])
+
+
+# Same paths as lists of original vertex ids, for reporting
+def all_paths(graph_, s_, t_, max_length=None, max_count=None):
+    g = as_graph(graph_)
+    if s_ not in g.index or t_ not in g.index:
+        return
+    s = g.index[s_]
+    for path in iter_paths(g, s, g.index[t_], max_length, max_count):
+        u = s
+        vertices = [g.labels[u]]
+        for i in path:
+            u = g.src[i] if g.dst[i] == u else g.dst[i]
+            vertices.append(g.labels[u])
+        yield vertices
+
+
+# Dinic's algorithm on the residual capacities cap (one entry per arc);
+# augments cap in place and returns the flow value
+def max_flow(g, cap, s, t):
+    n = len(g)
+    offsets = g.offsets
+    targets = g.targets
+    twin = g.twin
+    flow = 0
+    while True:
+        level = [-1] * n
+        level[s] = 0
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            for a in range(offsets[u], offsets[u + 1]):
+                if cap[a] > 0 and level[targets[a]] < 0:
+                    level[targets[a]] = level[u] + 1
+                    queue.append(targets[a])
+        if level[t] < 0:
+            return flow
+
+        # Blocking flow with an explicit stack of arcs instead of recursion
+        it = array("i", offsets[:n])
+        while True:
+            path = []
+            u = s
+            while u != t:
+                end = offsets[u + 1]
+                while it[u] < end:
+                    a = it[u]
+                    if cap[a] > 0 and level[targets[a]] == level[u] + 1:
+                        break
+                    it[u] += 1
+                if it[u] < end:
+                    a = it[u]
+                    path.append(a)
+                    u = targets[a]
+                    continue
+                # Dead end, retreat to the previous vertex
+                level[u] = -1
+                if not path:
+                    break
+                a = path.pop()
+                u = targets[twin[a]]
+                it[u] += 1
+            if u != t:
+                break
+            f = min(cap[a] for a in path)
+            for a in path:
+                cap[a] -= f
+                cap[twin[a]] += f
+            flow += f
+
+
+# Vertices reachable from s in the residual network after a maximum flow
+def residual_side(g, cap, s):
+    seen = bytearray(len(g))
+    seen[s] = 1
+    queue = deque([s])
+    while queue:
+        u = queue.popleft()
+        for a in range(g.offsets[u], g.offsets[u + 1]):
+            v = g.targets[a]
+            if cap[a] > 0 and not seen[v]:
+                seen[v] = 1
+                queue.append(v)
+    return seen
+
+
+# Biconnected components of the part of g reachable from root, by Tarjan's
+# algorithm with explicit stacks. Returns the block id of every edge (-1 for
+# edges outside that part, and for self loops) and the number of blocks.
+def edge_blocks(g, root):
+    n = len(g)
+    offsets = g.offsets
+    targets = g.targets
+    disc = array("i", [-1]) * n
+    low = array("i", [0]) * n
+    block = array("i", [-1]) * len(g.src)
+    blocks = 0
+    clock = 1
+    disc[root] = 0
+    stack = [(root, -1)]
+    it = [offsets[root]]
+    edges = []
+    while stack:
+        u, up = stack[-1]
+        a = it[-1]
+        if a < offsets[u + 1]:
+            it[-1] = a + 1
+            e = g.edge_of[a]
+            v = targets[a]
+            if e == up:
+                continue
+            if disc[v] < 0:
+                disc[v] = clock
+                low[v] = clock
+                clock += 1
+                edges.append(e)
+                stack.append((v, e))
+                it.append(offsets[v])
+            elif disc[v] < disc[u]:
+                edges.append(e)
+                low[u] = min(low[u], disc[v])
+            continue
+        stack.pop()
+        it.pop()
+        if not stack:
+            break
+        p = stack[-1][0]
+        low[p] = min(low[p], low[u])
+        if low[u] >= disc[p]:
+            # p separates u's subtree: the edges down to (p, u) form a block
+            while True:
+                e = edges.pop()
+                block[e] = blocks
+                if e == up:
+                    break
+            blocks += 1
+    return block, blocks
 
-# Prints all paths from 's' to 'd'
-def printAllPaths(s, d):
-    global graph, vertices
-    # Mark all the vertices as not visited
-    visited = [False for i in range(vertices[-1] + 1)]
 
-    # Create an array to store paths
-    path = []
-    beta = []
+# Blocks on the path from s to t in the block-cut tree; every simple s-t
+# path stays inside them. None when t is not reachable from s.
+def st_blocks(g, block, blocks, s, t):
+    n = len(g)
+    members = [[] for _ in range(blocks)]
+    of_vertex = [[] for _ in range(n)]
+    # Visit the edges block by block (counting sort on the block id), so
+    # mark[u] == b tells whether u was already put in block b
+    start = array("i", [0]) * (blocks + 1)
+    for b in block:
+        if b >= 0:
+            start[b + 1] += 1
+    for b in range(blocks):
+        start[b + 1] += start[b]
+    order = array("i", [0]) * start[blocks]
+    fill = array("i", start)
+    for i in range(len(block)):
+        b = block[i]
+        if b >= 0:
+            order[fill[b]] = i
+            fill[b] += 1
+    mark = array("i", [-1]) * n
+    for b in range(blocks):
+        for j in range(start[b], start[b + 1]):
+            i = order[j]
+            for u in (g.src[i], g.dst[i]):
+                if mark[u] != b:
+                    mark[u] = b
+                    of_vertex[u].append(b)
+                    members[b].append(u)
+    # Nodes 0..n-1 are vertices and n.. are blocks
+    parent = {s: -1}
+    queue = deque([s])
+    while queue and t not in parent:
+        x = queue.popleft()
+        nexts = of_vertex[x] if x < n else members[x - n]
+        for y in nexts:
+            y = y + n if x < n else y
+            if y not in parent:
+                parent[y] = x
+                queue.append(y)
+    if t not in parent:
+        return None
+    keep = set()
+    x = t
+    while x >= 0:
+        if x >= n:
+            keep.add(x - n)
+        x = parent[x]
+    return keep
 
-    # Call the recursive helper function to print all paths
-    printAllPathsUtil(s, d, visited, path, beta)
-    return beta
+
+# Shrink g before solving: keep only the blocks between s and t, merge
+# parallel edges (capacities add up), drop dangling vertices and contract
+# series chains through degree-2 vertices into their lightest edge. Works on
+# flat arrays over the edge ids of g, in rounds until a round contracts
+# nothing: an edge that absorbed others (merged into it, or left as the
+# lightest of a chain) stays their representative through parent, and
+# dropped edges get parent -1. Returns the reduced graph (same vertex
+# labels, weighted; g itself when reducing would not pay, see
+# REDUCE_GAIN), the reduced edge behind each edge of g (-1 for edges that
+# cannot be in a minimum cut) and how much the instance shrank.
+def reduce_graph(g, s, t):
+    n = len(g)
+    m = len(g.src)
+    stats = {"vertices": [n, 0], "edges": [m, 0], "pruned": 0, "merged": 0, "contracted": 0}
+    # O(n) test before the block search, which costs about as much as a
+    # max flow: a dangling or degree-2 vertex is where a round starts, so
+    # with few of them the reduction cannot pay (a graph that only block
+    # pruning would shrink is left as it is too)
+    low = sum(1 for u in range(n) if g.offsets[u + 1] - g.offsets[u] <= 2 and u != s and u != t)
+    if low * REDUCE_GAIN < m:
+        stats.update({"vertices": [n, n], "edges": [m, m]})
+        return g, array("i", range(m)), stats
+    block, blocks = edge_blocks(g, s)
+    keep = st_blocks(g, block, blocks, s, t)
+    src = array("i", g.src)
+    dst = array("i", g.dst)
+    weight = array("q", [1]) * m if g.weight is None else array("q", g.weight)
+    # Original edges each edge stands for, counted into the stats
+    size = array("i", [1]) * m
+    parent = array("i", [-1]) * m
+    live = array("i")
+    for i in range(m):
+        if keep is not None and block[i] in keep:
+            parent[i] = i
+            live.append(i)
+    stats["pruned"] = m - len(live)
+    del block
+
+    changed = True
+    while changed:
+        changed = False
+        before = len(live)
+        # CSR over the live edges; arcs[a] is an edge id
+        offsets = array("i", [0]) * (n + 1)
+        for e in live:
+            offsets[src[e] + 1] += 1
+            offsets[dst[e] + 1] += 1
+        for u in range(n):
+            offsets[u + 1] += offsets[u]
+        fill = array("i", offsets[:n])
+        arcs = array("i", [0]) * offsets[n]
+        for e in live:
+            for u in (src[e], dst[e]):
+                arcs[fill[u]] = e
+                fill[u] += 1
+        del fill
+
+        # Merge parallel edges: while scanning u, slot[v] is the first live
+        # edge to v if seen[v] == u
+        seen = array("i", [-1]) * n
+        slot = array("i", [0]) * n
+        deg = array("i", [0]) * n
+        for u in range(n):
+            for a in range(offsets[u], offsets[u + 1]):
+                e = arcs[a]
+                if parent[e] != e:
+                    continue
+                v = src[e] + dst[e] - u
+                if v == u:
+                    # Loop left by contracting a cycle through u
+                    parent[e] = -1
+                    stats["pruned"] += size[e]
+                elif seen[v] == u:
+                    f = slot[v]
+                    weight[f] += weight[e]
+                    size[f] += size[e]
+                    parent[e] = f
+                    stats["merged"] += 1
+                else:
+                    seen[v] = u
+                    slot[v] = e
+                    deg[u] += 1
+        del seen, slot
+
+        # Peel dangling vertices; deg counts the live edges at each vertex
+        queue = deque(u for u in range(n) if deg[u] == 1 and u != s and u != t)
+        while queue:
+            x = queue.popleft()
+            if deg[x] != 1:
+                continue
+            for a in range(offsets[x], offsets[x + 1]):
+                e = arcs[a]
+                if parent[e] == e:
+                    break
+            v = src[e] + dst[e] - x
+            parent[e] = -1
+            stats["pruned"] += size[e]
+            deg[x] = 0
+            deg[v] -= 1
+            if deg[v] == 1 and v != s and v != t:
+                queue.append(v)
+
+        # Contract each maximal chain of degree-2 vertices into its lightest
+        # edge, between the chain's two ends
+        for x in range(n):
+            if deg[x] != 2 or x == s or x == t:
+                continue
+            chain = []
+            ends = []
+            for a in range(offsets[x], offsets[x + 1]):
+                e = arcs[a]
+                if parent[e] != e:
+                    continue
+                u = x
+                v = src[e] + dst[e] - x
+                chain.append(e)
+                while v != x and v != s and v != t and deg[v] == 2:
+                    deg[v] = 0
+                    for b in range(offsets[v], offsets[v + 1]):
+                        f = arcs[b]
+                        if parent[f] == f and f != e:
+                            break
+                    e = f
+                    u = v
+                    v = src[e] + dst[e] - u
+                    chain.append(e)
+                ends.append(v)
+                if v == x:
+                    # x is on a cycle of degree-2 vertices alone
+                    break
+            deg[x] = 0
+            lightest = min(chain, key=lambda e: weight[e])
+            if ends[0] == x or ends[0] == ends[-1]:
+                # A cycle, or a loop back to one end: no s-t path uses it.
+                # The end's degree is fixed up by the next round.
+                for e in chain:
+                    parent[e] = -1
+                    stats["pruned"] += size[e]
+            else:
+                for e in chain:
+                    if e != lightest:
+                        parent[e] = -1
+                src[lightest] = ends[0]
+                dst[lightest] = ends[1]
+                stats["contracted"] += len(chain) - 1
+            changed = True
+        live = array("i", (e for e in live if parent[e] == e))
+        changed = changed and (before - len(live)) * REDUCE_GAIN >= before
+    del offsets, arcs, deg
+
+    # Renumber the vertices and edges left
+    h = empty_graph()
+    h.weight = array("q")
+    reduced = array("i", [-1]) * m
+    for e in live:
+        reduced[e] = len(h.src)
+        add_edge(h, g.labels[src[e]], g.labels[dst[e]], weight[e])
+    for label in (g.labels[s], g.labels[t]):
+        if label not in h.index:
+            h.index[label] = len(h.labels)
+            h.labels.append(label)
+    fill_adjacency(h)
+    # Follow parent to each edge's representative, compressing the paths
+    origin = array("i", [-1]) * m
+    for i in range(m):
+        root = i
+        while root >= 0 and parent[root] != root:
+            root = parent[root]
+        e = i
+        while e >= 0 and parent[e] != e:
+            parent[e], e = root, parent[e]
+        if root >= 0:
+            origin[i] = reduced[root]
+    stats["vertices"][1] = len(h)
+    stats["edges"][1] = len(h.src)
+    return h, origin, stats
+
+
+# Minimum s-t edge cut: returns its size (total weight, for weighted edges)
+# and the edges removed. graph_ is an edge list of pairs or (u, v, w) triples,
+# or a Graph (e.g. from load_graph); with reduce the instance goes
+# through reduce_graph first and the cut is mapped back to the input edges.
+def find_minimal_cut(graph_, s_, t_, reduce=True):
+    if s_ == t_:
+        raise Exception("Unsat")
+    g = as_graph(graph_)
+    if s_ not in g.index or t_ not in g.index:
+        return 0, []
+    h = g
+    if reduce:
+        h, origin, _ = reduce_graph(g, g.index[s_], g.index[t_])
+    cap = capacities(h)
+    flow = max_flow(h, cap, h.index[s_], h.index[t_])
+    side = residual_side(h, cap, h.index[s_])
+    cut = [i for i in range(len(h.src)) if side[h.src[i]] != side[h.dst[i]]]
+    if reduce:
+        crossing = bytearray(len(h.src))
+        for i in cut:
+            crossing[i] = 1
+        cut = [i for i in range(len(origin)) if origin[i] >= 0 and crossing[origin[i]]]
+    return flow, [edge_at(g, i) for i in cut]
 
 
 def find_minimal(graph_, s_, t_):
-    global graph, vertices
-    graph = graph_
-    v = set()
-    for i in range(len(graph)):
-        v.add(graph[i][0])
-        v.add(graph[i][1])
-    vertices = sorted(v)
-    all_paths = printAllPaths(s_, t_)
-    all_edges = []
-    for i in range(len(all_paths)):
-        p = []
-        for j in range(len(all_paths[i]) - 1):
-            a1 = min(all_paths[i][j], all_paths[i][j + 1])
-            a2 = max(all_paths[i][j], all_paths[i][j + 1])
-            v = Bool("e_{}_{}".format(a1, a2))
-            p.append(v)
-        all_edges.append(Or(p))
-    x = And(all_edges)
-    s = Solver()
-    s.add(x)
-    r = s.check()
-    if r == sat:
-        m = s.model()
-        q = 0
-        for i in range(len(m)):
-            if is_true(m[m.__getitem__(i)]):
-                q += 1
-        return q
+    return find_minimal_cut(graph_, s_, t_)[0]
+
+
+# Worker process of find_minimal_parallel: solves the (i, graph, s, t)
+# instances sent down conn one by one until it gets None
+def serve_instances(conn):
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        i, graph_, s_, t_ = job
+        try:
+            conn.send((i, find_minimal_cut(graph_, s_, t_), None))
+        except Exception as e:
+            conn.send((i, None, repr(e)))
+    conn.close()
+
+
+# Solve independent (graph, s, t) instances on a pool of worker processes.
+# Yields (i, (size, cut), error) for the i-th instance as soon as it is done,
+# in completion order. At most workers (default: all cores) processes are
+# started, and each is handed one instance at a time and reused for the
+# next, so an instance costs a round trip on a pipe rather than a fork. One
+# that runs past timeout seconds has its worker killed (error "timeout")
+# without touching the others, and a new worker takes its place.
+def find_minimal_parallel(instances, workers=None, timeout=None):
+    workers = workers or os.cpu_count() or 1
+    ctx = multiprocessing.get_context()
+    pending = enumerate(instances)
+    idle = []
+    running = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(running) < workers:
+                item = next(pending, None)
+                if item is None:
+                    exhausted = True
+                    break
+                i, (graph_, s_, t_) = item
+                if idle:
+                    conn, p = idle.pop()
+                else:
+                    conn, child = ctx.Pipe()
+                    p = ctx.Process(target=serve_instances, args=(child,), daemon=True)
+                    p.start()
+                    child.close()
+                conn.send((i, graph_, s_, t_))
+                deadline = None if timeout is None else time.monotonic() + timeout
+                running[conn] = (i, p, deadline)
+            if not running:
+                return
+
+            wait_for = None
+            if timeout is not None:
+                wait_for = max(0.0, min(d for (_, _, d) in running.values()) - time.monotonic())
+            for conn in wait(list(running), wait_for):
+                i, p, _ = running.pop(conn)
+                try:
+                    _, result, error = conn.recv()
+                    idle.append((conn, p))
+                except EOFError:
+                    conn.close()
+                    p.join()
+                    result, error = None, "worker exited with code {}".format(p.exitcode)
+                yield i, result, error
+
+            now = time.monotonic()
+            for conn in [c for c in running if running[c][2] is not None and running[c][2] <= now]:
+                i, p, _ = running.pop(conn)
+                p.kill()
+                p.join()
+                conn.close()
+                yield i, None, "timeout"
+    finally:
+        for conn, p in idle:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+            p.join()
+        for conn, (i, p, _) in running.items():
+            p.kill()
+            p.join()
+            conn.close()
+
+
+# Gomory-Hu tree by Gusfield's method: n - 1 max-flow calls on the original
+# graph, no contraction. Vertex u hangs below parent[u] with an edge whose
+# weight is the min cut between them; the root 0 has parent -1.
+def gomory_hu_tree(g):
+    n = len(g)
+    parent = array("i", [0]) * n
+    weight = array("q", [0]) * n
+    if n > 0:
+        parent[0] = -1
+    for u in range(1, n):
+        t = parent[u]
+        cap = capacities(g)
+        weight[u] = max_flow(g, cap, u, t)
+        side = residual_side(g, cap, u)
+        for v in range(u + 1, n):
+            if side[v] and parent[v] == t:
+                parent[v] = u
+    return parent, weight
+
+
+# Min cut between u and v: the lightest edge on their tree path
+def tree_min_cut(parent, weight, depth, u, v):
+    best = None
+    while u != v:
+        if depth[u] < depth[v]:
+            u, v = v, u
+        if best is None or weight[u] < best:
+            best = weight[u]
+        u = parent[u]
+    return best
+
+
+def tree_depths(parent):
+    depth = array("i", [-1]) * len(parent)
+    for u in range(len(parent)):
+        chain = []
+        while u >= 0 and depth[u] < 0:
+            chain.append(u)
+            u = parent[u]
+        d = depth[u] if u >= 0 else -1
+        for w in reversed(chain):
+            d += 1
+            depth[w] = d
+    return depth
+
+
+# Min cut sizes for many (s, t) pairs on the same graph: the Gomory-Hu tree
+# is built once and every query is a walk up the tree. Returns the sizes and
+# stats with the build time and the latency of each query.
+def find_minimal_batch(graph_, pairs):
+    g = as_graph(graph_)
+    stats = {"build_time": 0.0, "query_times": []}
+    start = time.perf_counter()
+    parent, weight = gomory_hu_tree(g)
+    depth = tree_depths(parent)
+    stats["build_time"] = time.perf_counter() - start
+    result = []
+    for (s_, t_) in pairs:
+        start = time.perf_counter()
+        if s_ == t_:
+            raise Exception("Unsat")
+        if s_ not in g.index or t_ not in g.index:
+            result.append(0)
+        else:
+            result.append(tree_min_cut(parent, weight, depth, g.index[s_], g.index[t_]))
+        stats["query_times"].append(time.perf_counter() - start)
+    return result, stats
+
+
+def edge_var(a, b):
+    return Bool("e_{}_{}".format(min(a, b), max(a, b)))
+
+
+# Shortest s-t path avoiding the removed edge ids, as a list of edge ids
+def surviving_path(g, s, t, removed):
+    parent = array("i", [-1]) * len(g)
+    parent[s] = -2
+    queue = deque([s])
+    while queue:
+        u = queue.popleft()
+        for a in range(g.offsets[u], g.offsets[u + 1]):
+            v = g.targets[a]
+            if parent[v] == -1 and g.edge_of[a] not in removed:
+                parent[v] = a
+                if v == t:
+                    path = []
+                    while v != s:
+                        path.append(g.edge_of[parent[v]])
+                        v = g.targets[g.twin[parent[v]]]
+                    return path
+                queue.append(v)
+    return None
+
+
+# Cheapest set of true atoms satisfying the clauses added to opt so far
+def minimize_optimize(opt, atoms, stats):
+    start = time.perf_counter()
+    r = opt.check()
+    stats["solver_calls"] += 1
+    stats["probes"].append((None, r == sat, time.perf_counter() - start))
+    if r != sat:
+        raise Exception("Unsat")
+    m = opt.model()
+    return [i for i in atoms if is_true(m.eval(atoms[i]))]
+
+
+# Solver for minimize_bound. The finite-domain (QF_FD) solver keeps PbLe
+# as a native constraint of its SAT core; the default SMT solver needs
+# exponentially long proofs that a dense graph has no smaller cut (K_22:
+# 19 s for the last probe, against 0.05 s here for the whole K_24 search).
+def bound_solver():
+    return SolverFor("QF_FD")
+
+
+# Same, by binary search on a pseudo-boolean bound sum(w_e * e) <= k that
+# is only enabled through an assumption literal, so the solver keeps
+# everything it learned across probes. lo is a known lower bound; best, if
+# given, a known solution, so only bounds below its weight are probed. The
+# first probe is k = lo, which is optimal whenever it is sat.
+def minimize_bound(s, atoms, weights, lo, stats, best=None):
+    if not atoms:
+        return []
+    if best is None:
+        hi = sum(weights[i] for i in atoms)
     else:
+        hi = sum(weights[i] for i in best) - 1
+    k = lo
+    while lo <= hi:
+        guard = Bool("bound_{}".format(stats["solver_calls"]))
+        s.add(Or(Not(guard), PbLe([(atoms[i], weights[i]) for i in atoms], k)))
+        start = time.perf_counter()
+        r = s.check(guard)
+        stats["solver_calls"] += 1
+        stats["probes"].append((k, r == sat, time.perf_counter() - start))
+        if r == sat:
+            m = s.model()
+            best = [i for i in atoms if is_true(m.eval(atoms[i]))]
+            hi = sum(weights[i] for i in best) - 1
+        else:
+            lo = k + 1
+        k = (lo + hi) // 2
+    if best is None:
         raise Exception("Unsat")
+    return best
+
+
+def new_stats():
+    return {"solver_calls": 0, "clauses": 0, "optimum": None, "probes": []}
+
+
+# Lazy cut generation: start without path clauses and only add the clause
+# of an s-t path that survives the edges removed by the current model
+def find_minimal_lazy(graph_, s_, t_, minimize="optimize"):
+    if s_ == t_:
+        raise Exception("Unsat")
+    g = as_graph(graph_)
+    stats = new_stats()
+    if s_ not in g.index or t_ not in g.index:
+        stats["optimum"] = 0
+        return 0, [], stats
+    s = g.index[s_]
+    t = g.index[t_]
+    solver = Optimize() if minimize == "optimize" else bound_solver()
+    atoms = {}
+    weights = {}
+    removed = []
+    while True:
+        path = surviving_path(g, s, t, set(removed))
+        if path is None:
+            break
+        clause = []
+        for i in path:
+            if i not in atoms:
+                atoms[i] = edge_var(*edge_at(g, i)[:2])
+                weights[i] = edge_weight(g, i)
+                if minimize == "optimize":
+                    solver.add_soft(Not(atoms[i]), weights[i])
+            clause.append(atoms[i])
+        solver.add(Or(clause))
+        stats["clauses"] += 1
+        # The optimum never decreases as clauses are added, and grows by at
+        # most the lightest edge of the new path: the last cut plus that
+        # edge meets every clause
+        if minimize == "optimize":
+            removed = minimize_optimize(solver, atoms, stats)
+        else:
+            lightest = min(path, key=lambda i: weights[i])
+            removed = minimize_bound(solver, atoms, weights, sum(weights[i] for i in removed), stats,
+                                     removed + [lightest])
+    cut = [edge_at(g, i) for i in sorted(removed)]
+    stats["optimum"] = sum(edge_weight(g, i) for i in removed)
+    return stats["optimum"], cut, stats
+
+
+# Eager encoding: one clause per simple s-t path, minimized in one go
+def find_minimal_eager(graph_, s_, t_, minimize="optimize"):
+    if s_ == t_:
+        raise Exception("Unsat")
+    stats = new_stats()
+    g = as_graph(graph_)
+    if s_ not in g.index or t_ not in g.index:
+        stats["optimum"] = 0
+        return 0, [], stats
+    solver = Optimize() if minimize == "optimize" else bound_solver()
+    atoms = {}
+    weights = {}
+    for path in iter_paths(g, g.index[s_], g.index[t_]):
+        p = []
+        for e in path:
+            if e not in atoms:
+                atoms[e] = edge_var(*edge_at(g, e)[:2])
+                weights[e] = edge_weight(g, e)
+                if minimize == "optimize":
+                    solver.add_soft(Not(atoms[e]), weights[e])
+            p.append(atoms[e])
+        solver.add(Or(p))
+        stats["clauses"] += 1
+    if minimize == "optimize":
+        removed = minimize_optimize(solver, atoms, stats)
+    else:
+        removed = minimize_bound(solver, atoms, weights, 0, stats)
+    cut = [edge_at(g, i) for i in sorted(removed)]
+    stats["optimum"] = sum(edge_weight(g, i) for i in removed)
+    return stats["optimum"], cut, stats
+
+
+# SAT encoding of the minimal cut, for constrained variants of the problem;
+# minimize is "optimize" (z3 Optimize) or "bound" (PbLe binary search)
+def find_minimal_sat(graph_, s_, t_, lazy=False, minimize="optimize"):
+    if lazy:
+        return find_minimal_lazy(graph_, s_, t_, minimize)[0]
+    return find_minimal_eager(graph_, s_, t_, minimize)[0]
@@ -1,93 +1,720 @@
 import itertools
-from z3 import Bool, And, Or, Not, PbEq, PbGe, Solver, sat, is_true
+import math
+import random
+import threading
+try:
+    import mastermind_filter
+    import mastermind_bayes
+    import mastermind_book
+except ImportError:
+    mastermind_filter = None
+    mastermind_bayes = None
+    mastermind_book = None
+from z3 import Bool, BoolVal, BitVec, Int, FreshBool, And, Or, Not, Xor, ULT, Extract, PbEq, AstVector, Context, \
+    Optimize, Solver, sat, is_true, is_and
 
-# Global variables
-k = 0
-n = 0
-vs = []
-move = []
-s = Solver()
-guess_list = []
-response_list = []
-base_cons = []
+# Largest n^k played by the NumPy consistency filter instead of SAT: about
+# where a filter move gets slower than a SAT move (mastermind_bench.py
+# backend; around 2 * 10^5 codes both take 3-5 ms, at 10^6 the filter takes
+# 16 ms against 4 ms)
+FILTER_LIMIT = 2 * 10 ** 5
 
+AMO_ENCODINGS = ("pairwise", "sequential", "commander", "bimander", "native")
 
-# CNF for "Sum to one" constaint
-def sum_to_one(ls):
-    A = Or(ls)
-    atmost_one_list = []
-    for pair in itertools.combinations(ls, 2):
-        atmost_one_list.append(Or(Not(pair[0]), Not(pair[1])))
-    return And(A, And(atmost_one_list))
+CODE_ENCODINGS = ("onehot", "order", "bitvec", "int")
 
+# Candidate counting: codes enumerated before switching to XOR hashing (and
+# the most each hashed cell may hold), and the most hashing rounds whose
+# estimates are taken the median of
+COUNT_LIMIT = 32
+COUNT_ROUNDS = 3
+# Random codes checked against the responses (with numpy), and the hits
+# among them that make their share of n^k the count (about 12% error)
+# without asking the solver at all
+COUNT_SAMPLES = 1 << 16
+COUNT_HITS = 64
+# Chance of each code bit to be in a hashing XOR: sparser XORs are much
+# easier on the solver (n = 12, k = 6: 0.3 s per count against 18 s for
+# 0.5) for a somewhat looser estimate, see mastermind_bench.py count
+COUNT_DENSITY = 0.3
+# Solver calls a hashed count may make past its exact first cell: with the
+# sample taking the large counts, 16 keeps a count around one move's time
+# (n = 12, k = 7: 50 ms on average, at most 0.2 s, 18% error at the 90th
+# percentile, which 64 calls bring to no better than 25%)
+COUNT_CHECKS = 16
 
-# mastermind.initialize(n,k) called in harness
-def initialize(n_, k_):
-    global k, n, vs, move, s, guess_list, response_list, base_cons
-    k = k_
-    n = n_
-    vs = [[Bool("e_{}_{}".format(i, j)) for j in range(n)] for i in range(k)]
-    base_cons = []
-    for i in range(k):
-        base_cons.append(sum_to_one(vs[i]))
+# Player behind the module-level API used by the harness
+player = None
 
-    s.add(And(base_cons))
+# Base-constraint templates by (n, k, encoding, amo)
+templates = {}
+templates_lock = threading.Lock()
 
 
-# mastermind.put_first_player_response(red,white) called in harness
-def put_first_player_response(red, white):
-    global k, n, vs, move, s, guess_list, response_list, base_cons
+# Fastest at-most-one encoding for n literals, from the grid measured by
+# mastermind_bench.py amo
+def default_amo(n):
+    if n <= 16:
+        return "pairwise"
+    return "commander"
 
-    response_list.append((red, white))
 
-    cons = PbEq([(vs[i][move[i]], 1) for i in range(k)], red)
-    guess_cons = white_cons(move, white)
+# Fastest code encoding for n colors and k pegs, from the grid measured by
+# mastermind_bench.py encoding: the log encoding wins per game from n = 8 on
+# (and by more the more colors), mostly by needing fewer moves rather than
+# by faster ones; one-hot only on the smallest games
+def default_encoding(n, k):
+    if n < 8:
+        return "onehot"
+    return "bitvec"
 
-    s.add(And(guess_cons, cons))
 
+# Pairwise: O(n^2) binary clauses, no auxiliary variables
+def amo_pairwise(ls):
+    clauses = []
+    for pair in itertools.combinations(ls, 2):
+        clauses.append(Or(Not(pair[0]), Not(pair[1])))
+    return clauses
 
-# mastermind.get_second_player_move() called in harness
-def get_second_player_move():
-    global k, n, vs, move, s, guess_list, response_list, base_cons
-    if len(guess_list) == 0:
-        # initial guess
-        move = [0] * k
+
+# Sequential counter (ladder): s_i is true once one of ls[0..i] is true,
+# 3n - 4 clauses and n - 1 auxiliary variables
+def amo_sequential(ls):
+    if len(ls) <= 1:
+        return []
+    s = [FreshBool(ctx=ls[0].ctx) for i in range(len(ls) - 1)]
+    clauses = [Or(Not(ls[0]), s[0])]
+    for i in range(1, len(ls) - 1):
+        clauses.append(Or(Not(ls[i]), s[i]))
+        clauses.append(Or(Not(s[i - 1]), s[i]))
+        clauses.append(Or(Not(ls[i]), Not(s[i - 1])))
+    clauses.append(Or(Not(ls[-1]), Not(s[-1])))
+    return clauses
+
+
+# Commander: pairwise inside groups of three, each group's commander is
+# implied by its members, and at most one commander recursively
+def amo_commander(ls, group=3):
+    if len(ls) <= group + 1:
+        return amo_pairwise(ls)
+    clauses = []
+    commanders = []
+    for g in range(0, len(ls), group):
+        members = ls[g:g + group]
+        c = FreshBool(ctx=ls[0].ctx)
+        commanders.append(c)
+        clauses.extend(amo_pairwise(members))
+        for x in members:
+            clauses.append(Or(Not(x), c))
+        clauses.append(Or([Not(c)] + members))
+    return clauses + amo_commander(commanders, group)
+
+
+# Bimander: pairwise inside groups of two, and each group forces its index
+# onto ceil(log2(#groups)) shared bits
+def amo_bimander(ls, group=2):
+    groups = [ls[g:g + group] for g in range(0, len(ls), group)]
+    bits = []
+    if len(groups) > 1:
+        bits = [FreshBool(ctx=ls[0].ctx) for i in range(math.ceil(math.log2(len(groups))))]
+    clauses = []
+    for g in range(len(groups)):
+        clauses.extend(amo_pairwise(groups[g]))
+        for x in groups[g]:
+            for j in range(len(bits)):
+                clauses.append(Or(Not(x), bits[j] if (g >> j) & 1 else Not(bits[j])))
+    return clauses
+
+
+# Constraints for "exactly one of ls" under the given at-most-one encoding;
+# native hands the whole thing to z3 as a pseudo-boolean equality
+def exactly_one(ls, encoding=None):
+    encoding = encoding or default_amo(len(ls))
+    if encoding == "native":
+        return [PbEq([(x, 1) for x in ls], 1)]
+    if encoding == "pairwise":
+        clauses = amo_pairwise(ls)
+    elif encoding == "sequential":
+        clauses = amo_sequential(ls)
+    elif encoding == "commander":
+        clauses = amo_commander(ls)
+    elif encoding == "bimander":
+        clauses = amo_bimander(ls)
     else:
-        move = get_a_solution()
+        raise Exception("Unknown encoding " + str(encoding))
+    return [Or(ls)] + clauses
 
-    guess_list.append(move)
-    return move
 
+# CNF for "Sum to one" constaint
+def sum_to_one(ls, encoding=None):
+    return And(exactly_one(ls, encoding))
 
-# Solve the SAT problem and return the move, if none then reset solver
-def get_a_solution():
-    global k, n, vs, move, s, guess_list, response_list, base_cons
-    sol = [0] * k
-    if s.check() == sat:
-        m = s.model()
+
+# Variables of peg i with n colors under a code encoding, and the
+# constraints keeping them to one color:
+#   onehot: n Bools e_i_j, exactly one true (under the at-most-one encoding amo)
+#   order: n - 1 Bools o_i_j, "color >= j", each implying the one below
+#   bitvec: one ceil(log2 n)-bit BitVec p_i below n
+#   int: one Int p_i in [0, n), like test_mastermind_2.py
+def peg_vars(i, n, encoding, amo=None, ctx=None):
+    if encoding == "onehot":
+        vs = [Bool("e_{}_{}".format(i, j), ctx) for j in range(n)]
+        return vs, exactly_one(vs, amo)
+    if encoding == "order":
+        vs = [Bool("o_{}_{}".format(i, j), ctx) for j in range(1, n)]
+        return vs, [Or(Not(vs[j]), vs[j - 1]) for j in range(1, n - 1)]
+    if encoding == "bitvec":
+        bits = max(1, (n - 1).bit_length())
+        v = BitVec("p_{}".format(i), bits, ctx)
+        return v, [] if n == 2 ** bits else [ULT(v, n)]
+    if encoding == "int":
+        v = Int("p_{}".format(i), ctx)
+        return v, [v >= 0, v < n]
+    raise Exception("Unknown encoding " + str(encoding))
+
+
+# "The peg has color c" over the variables v of one peg
+def peg_eq(v, c, n, encoding, ctx=None):
+    if encoding == "onehot":
+        return v[c]
+    if encoding == "order":
+        parts = []
+        if c > 0:
+            parts.append(v[c - 1])
+        if c < n - 1:
+            parts.append(Not(v[c]))
+        if not parts:
+            return BoolVal(True, ctx)
+        return parts[0] if len(parts) == 1 else And(parts)
+    return v == c
+
+
+# Color of the peg with variables v in model m
+def peg_value(m, v, n, encoding):
+    if encoding == "onehot":
+        for j in range(n):
+            if is_true(m.eval(v[j], model_completion=True)):
+                return j
+        return 0
+    if encoding == "order":
+        return sum(1 for x in v if is_true(m.eval(x, model_completion=True)))
+    return m.eval(v, model_completion=True).as_long()
+
+
+# The peg variables and their domain constraints for (n, k, encoding, amo),
+# built once in a context of their own: one And of all the constraints and
+# an AstVector of all the variables, peg by peg. A new player translates the
+# two into its context (two C-level copies) instead of building the
+# O(k n^2) clauses again; the lock keeps translations from different
+# threads off the template context one at a time.
+class Template:
+    __slots__ = ("ctx", "base", "terms", "per", "lock")
+
+    def __init__(self, n, k, encoding, amo):
+        self.ctx = Context()
+        # Variables per peg, None for the single-term encodings
+        self.per = {"onehot": n, "order": n - 1}.get(encoding)
+        self.terms = AstVector(None, self.ctx)
+        cons = []
         for i in range(k):
-            for j in range(n):
-                val = m[vs[i][j]]
-                if is_true(val):
-                    sol[i] = j
+            v, c = peg_vars(i, n, encoding, amo, self.ctx)
+            for x in (v if isinstance(v, list) else [v]):
+                self.terms.push(x)
+            cons.extend(c)
+        self.base = And(cons) if cons else BoolVal(True, self.ctx)
+        self.lock = threading.Lock()
+
+    # The constraints and the variables of each peg in ctx
+    def translate(self, ctx, k):
+        with self.lock:
+            base = self.base.translate(ctx)
+            terms = self.terms.translate(ctx)
+        flat = [terms[j] for j in range(len(terms))]
+        if self.per is None:
+            return base, flat
+        return base, [flat[i * self.per:(i + 1) * self.per] for i in range(k)]
+
+
+def base_template(n, k, encoding, amo):
+    with templates_lock:
+        if (n, k, encoding, amo) not in templates:
+            templates[(n, k, encoding, amo)] = Template(n, k, encoding, amo)
+        return templates[(n, k, encoding, amo)]
+
+
+# Solver for MastermindPlayer.candidates in a context of its own: the XOR
+# and blocking terms it builds would otherwise shift the term ids of the
+# player's context, and with them the moves z3 picks. It gets copies of the
+# player's assertions and peg variables.
+class Counter:
+    __slots__ = ("ctx", "s", "vs", "n", "k", "encoding", "bits", "counted", "m", "checks",
+                 "sample", "agree")
+
+    def __init__(self, player):
+        self.ctx = Context()
+        self.s = Solver(ctx=self.ctx)
+        self.vs = [[x.translate(self.ctx) for x in v] if isinstance(v, list) else v.translate(self.ctx)
+                   for v in player.vs]
+        self.n = player.n
+        self.k = player.k
+        self.encoding = player.encoding
+        # Assertions of the player's solver copied so far
+        self.counted = 0
+        # XOR constraints the last count needed, None before the first
+        self.m = None
+        # Solver calls made so far
+        self.checks = 0
+        # COUNT_SAMPLES random codes (None without numpy), and which of them
+        # agree with each response, by response index
+        self.sample = None
+        if mastermind_filter is not None:
+            self.sample = mastermind_filter.sample_codes(self.n, self.k, COUNT_SAMPLES)
+        self.agree = {}
+        # ceil(log2 n) Bools per peg spelling out its color in binary, the
+        # variables hashed by random_xor
+        width = max(1, (self.n - 1).bit_length())
+        self.bits = []
+        for i in range(self.k):
+            for b in range(width):
+                if self.encoding == "bitvec":
+                    self.bits.append(Extract(b, b, self.vs[i]) == 1)
+                else:
+                    self.bits.append(Or([self.eq(i, c) for c in range(self.n) if (c >> b) & 1]))
+
+    def eq(self, i, c):
+        return peg_eq(self.vs[i], c, self.n, self.encoding, self.ctx)
+
+    # Copy the assertions added to the player's solver since the last call
+    def sync(self, assertions):
+        for j in range(self.counted, len(assertions)):
+            self.s.add(assertions[j].translate(self.ctx))
+        self.counted = len(assertions)
+
+    # Codes consistent with the responses guarded by active and the
+    # constraints cons, enumerated by blocking each one found, up to
+    # limit + 1, or None if the solver calls reach stop before that is settled
+    def count_cell(self, cons, limit, active, stop=None):
+        s = self.s
+        s.push()
+        s.add(cons)
+        count = 0
+        while count <= limit:
+            if stop is not None and self.checks >= stop:
+                count = None
+                break
+            self.checks += 1
+            if s.check(active) != sat:
+                break
+            m = s.model()
+            code = [peg_value(m, self.vs[i], self.n, self.encoding) for i in range(self.k)]
+            s.add(Or([Not(self.eq(i, code[i])) for i in range(self.k)]))
+            count += 1
+        s.pop()
+        return count
+
+    # XOR of each bit with probability density (at least one of them),
+    # equal to a random parity
+    # Sampled codes agreeing with all the responses of the given indices
+    def sampled(self, player, indices):
+        hits = None
+        for j in indices:
+            if j not in self.agree:
+                red, white = mastermind_filter.score_all(self.sample, player.guess_list[j])
+                self.agree[j] = (red == player.response_list[j][0]) & (white == player.response_list[j][1])
+            hits = self.agree[j] if hits is None else hits & self.agree[j]
+        return COUNT_SAMPLES if hits is None else int(hits.sum())
+
+    def random_xor(self, rng, density):
+        chosen = [x for x in self.bits if rng.random() < density]
+        if not chosen:
+            chosen = [rng.choice(self.bits)]
+        parity = BoolVal(rng.random() < 0.5, self.ctx)
+        for x in chosen:
+            parity = Xor(parity, x)
+        return parity
+
+
+# One game of the second player. Each session owns its own z3 Context and
+# solver, so sessions can be played side by side on different threads.
+#   encoding: variables of a peg, one of CODE_ENCODINGS (default: fastest
+#     for n and k); the constraints only see them through eq(i, c)
+#   amo: at-most-one encoding of the one-hot pegs (default: fastest for n)
+#   mode: "exact" (drop responses in unsat cores) or "maxsat" (play a code
+#     violating the fewest responses, each wrong with probability error_rate)
+#   backend: "sat", "filter" or "bayes"; by default small games go to
+#     mastermind_filter, which picks its guesses by strategy ("first",
+#     "minimax" or "expected"). mastermind_bayes weights every code by the
+#     likelihood of the responses under noise ("harness" or "uniform" lies
+#     at error_rate) and plays by strategy "first"/"map" or "info".
+#   symmetry: break the symmetry between never-guessed colors (off by
+#     default, mastermind_bench.py symmetry finds it slower on these sizes)
+#   book: play the opening from the mastermind_book file of this (n, k) and
+#     policy, if one was built; the solver only sees the responses once the
+#     game leaves the book
+class MastermindPlayer:
+    __slots__ = ("k", "n", "ctx", "vs", "move", "s", "guess_list", "response_list",
+                 "base_cons", "amo", "counts", "guards", "active", "mode",
+                 "error_rate", "backend", "symmetry", "prefix", "precedence",
+                 "encoding", "eqs", "policy", "book", "book_key", "counter")
+
+    def __init__(self, n, k, amo=None, mode="exact", error_rate=0.5, backend=None,
+                 strategy="first", symmetry=False, noise="harness", encoding=None, book=True):
+        self.k = k
+        self.n = n
+        self.move = []
+        self.guess_list = []
+        self.response_list = []
+        # None until the first move looks the book up, False once off book
+        self.book = None if book and mastermind_book is not None else False
+        self.book_key = 0
+        if backend is None:
+            use_filter = mastermind_filter is not None and n ** k <= FILTER_LIMIT
+            backend = "filter" if use_filter else "sat"
+        if backend == "filter":
+            if mastermind_filter is None:
+                raise Exception("The filter backend needs numpy")
+            self.backend = mastermind_filter.FilterPlayer(n, k, strategy)
+            self.policy = "filter-{}".format(strategy)
+            return
+        if backend == "bayes":
+            if mastermind_bayes is None:
+                raise Exception("The bayes backend needs numpy")
+            self.backend = mastermind_bayes.BayesPlayer(n, k, noise, error_rate, strategy)
+            self.policy = "bayes-{}-{}-{}".format(noise, error_rate, strategy)
+            return
+        self.backend = None
+        self.encoding = encoding or default_encoding(n, k)
+        self.amo = amo or default_amo(n)
+        self.mode = mode
+        self.error_rate = error_rate
+        self.ctx = Context()
+        if mode == "maxsat":
+            self.s = Optimize(ctx=self.ctx)
+        elif mode == "exact":
+            self.s = Solver(ctx=self.ctx)
+            self.s.set("core.minimize", True)
+        else:
+            raise Exception("Unknown mode " + str(mode))
+        self.counts = {}
+        self.guards = []
+        self.active = []
+        self.symmetry = symmetry
+        self.prefix = {}
+        self.precedence = {}
+        self.eqs = {}
+        self.counter = None
+        base, self.vs = base_template(n, k, self.encoding, self.amo).translate(self.ctx, k)
+        self.base_cons = [base]
+
+        self.s.add(base)
+        self.policy = "sat-{}-{}-{}-{}-{}".format(mode, self.encoding, self.amo, symmetry, error_rate)
+
+    # Bool expression for "peg i has color c", built once
+    def eq(self, i, c):
+        if (i, c) not in self.eqs:
+            self.eqs[(i, c)] = peg_eq(self.vs[i], c, self.n, self.encoding, self.ctx)
+        return self.eqs[(i, c)]
+
+    # While the game is in the book only the key moves on; the solver gets
+    # the responses when it is first needed
+    def put_first_player_response(self, red, white):
+        self.response_list.append((red, white))
+        if self.book is not False:
+            self.book_key = mastermind_book.response_key(self.book_key, red, white, self.k)
+        if self.backend is not None:
+            return self.backend.put_first_player_response(red, white)
+        if self.book is False:
+            self.add_response(self.move, red, white)
+
+    # The response only holds while its assumption literal is active
+    def add_response(self, move, red, white):
+        cons = PbEq([(self.eq(i, move[i]), 1) for i in range(self.k)], red)
+        guess_cons = self.white_cons(move, red + white)
+
+        guard = Bool("resp_{}".format(len(self.guards)), self.ctx)
+        self.guards.append(guard)
+        self.active.append(guard)
+        self.s.add(Or(Not(guard), And(guess_cons, cons)))
+        if self.mode == "maxsat":
+            if self.error_rate > 0:
+                self.s.add_soft(guard, response_weight(self.error_rate))
+            else:
+                self.s.add(guard)
+
+    def get_second_player_move(self):
+        move = self.book_move()
+        if move is not None:
+            self.move = move
+            if self.backend is not None:
+                self.backend.move = move
+                self.backend.guess_list.append(move)
+        elif self.backend is not None:
+            self.move = self.backend.get_second_player_move()
+        elif len(self.guess_list) == 0:
+            # initial guess
+            self.move = [0] * self.k
+        else:
+            self.move = self.get_a_solution()
+
+        self.guess_list.append(self.move)
+        return self.move
+
+    # Hand over the responses that came in while in the book
+    def sync_responses(self):
+        for j in range(len(self.guards), len(self.response_list)):
+            self.add_response(self.guess_list[j], *self.response_list[j])
+
+    # The book's move for the responses so far, or None once off book (the
+    # book is loaded on the first move)
+    def book_move(self):
+        if self.book is None:
+            self.book = mastermind_book.load(self.n, self.k, self.policy) or False
+        if self.book is False:
+            return None
+        move = self.book.move(self.book_key)
+        if move is None:
+            self.book = False
+        return move
+
+    # Size of the session: constraint terms on the solver (the arguments of
+    # a top-level And one by one, so every clause of the base CNF counts)
+    # responses still believed, and the candidates left (see candidates; at
+    # most one move's time at harness sizes). The filter and bayes backends
+    # have no terms; they report the responses and candidates only.
+    def stats(self):
+        if self.backend is not None:
+            return self.backend.stats()
+        terms = sum(a.num_args() if is_and(a) else 1 for a in self.s.assertions())
+        return {"terms": terms, "responses": len(self.response_list), "active": len(self.active),
+                "candidates": self.candidates()}
+
+    # Solve the SAT problem under the active responses and return the move.
+    # If the feedback is inconsistent, the responses in the unsat core are
+    # dropped (some of them were wrong) and the same solver is asked again.
+    # In maxsat mode the responses are soft and Optimize picks the least
+    # violating code; the responses that code satisfies become the active
+    # ones.
+    # The symmetry guard is sound (it only removes permuted copies of
+    # solutions), so it is never dropped with the responses.
+    def get_a_solution(self):
+        self.sync_responses()
+        s = self.s
+        sol = [0] * self.k
+        sym = self.symmetry_guard()
+        if self.mode == "maxsat":
+            if s.check(*sym) != sat:
+                raise Exception("Unsat")
+        else:
+            while s.check(self.active + sym) != sat:
+                core = set(str(g) for g in s.unsat_core())
+                core.difference_update(str(g) for g in sym)
+                if not core:
+                    raise Exception("Unsat")
+                self.active = [g for g in self.active if str(g) not in core]
+        m = s.model()
+        if self.mode == "maxsat":
+            self.active = [g for g in self.guards if is_true(m.eval(g, model_completion=True))]
+        for i in range(self.k):
+            sol[i] = peg_value(m, self.vs[i], self.n, self.encoding)
         return sol
-    else:
-        s.reset()
-        s.add(And(base_cons))
-        guess_list = []
-        response_list = []
-        return [0] * k
-
-
-# Helper function for white
-def white_cons(ls, whites):
-    global k, n, vs, move, s, guess_list, response_list, base_cons
-    l_white = []
-    for i in range(len(ls)):
-        A = False
-        for j in range(k):
-            A = Or(A, vs[j][ls[i]])
-        l_white.append(A)
-
-    cons = PbGe([(l_white[i], 1) for i in range(len(l_white))], whites)
-    return cons
+
+    # Number of codes consistent with the active responses (symmetry breaking
+    # left out). With numpy, COUNT_SAMPLES random codes are checked against
+    # the responses first: COUNT_HITS or more agreeing ones make their share
+    # of n^k the count. Otherwise up to limit codes are enumerated exactly
+    # with blocking clauses (skipped when the sample already shows more);
+    # above that the count is estimated ApproxMC-style: m random XOR
+    # constraints over the bits of the code cut the codes into 2^m cells,
+    # the smallest m leaving at most limit codes in one cell is searched for
+    # (galloping up or down from the m the sample suggests, or else the m of
+    # the last round or call), that cell's size times 2^m is one estimate,
+    # and the median of up to rounds estimates is returned. Past the first
+    # cell of each round (at most limit + 1 solver calls, like the exact
+    # one), the hashing makes at most checks solver calls (None for no
+    # limit): a round cut short estimates from the smallest cell it has
+    # settled, or failing that from a cell found too big (a lower bound),
+    # and no round starts once the calls are used up. A larger limit, more rounds or denser XORs give
+    # a tighter estimate for more solver calls, and slower ones (see
+    # mastermind_bench.py count). The counting runs on a Counter, as
+    # Optimize would weigh the soft responses on every check. The filter
+    # and bayes backends count their candidates directly.
+    def candidates(self, limit=COUNT_LIMIT, rounds=COUNT_ROUNDS, seed=0, density=COUNT_DENSITY,
+                   checks=COUNT_CHECKS):
+        if self.backend is not None:
+            return self.backend.stats()["candidates"]
+        self.sync_responses()
+        if self.counter is None:
+            self.counter = Counter(self)
+        counter = self.counter
+        counter.sync(self.s.assertions())
+        bits = counter.bits
+        # Counts only shrink as responses come in, so the last call's m (or,
+        # on the first call, the m for the whole code space) is a close start
+        m = counter.m or min(len(bits), max(1, int(math.log2(self.n ** self.k / limit))))
+        sampled = None
+        if counter.sample is not None:
+            index = {g.get_id(): j for j, g in enumerate(self.guards)}
+            hits = counter.sampled(self, [index[g.get_id()] for g in self.active])
+            if hits >= COUNT_HITS:
+                return hits * self.n ** self.k // COUNT_SAMPLES
+            if hits > 0:
+                sampled = hits * self.n ** self.k / COUNT_SAMPLES
+        active = [g.translate(counter.ctx) for g in self.active]
+        counts = {}
+        if sampled is None or sampled <= 2 * limit:
+            counts[0] = counter.count_cell([], limit, active)
+            if counts[0] <= limit:
+                return counts[0]
+        else:
+            m = min(len(bits), max(1, math.ceil(math.log2(sampled / limit))))
+        stop = None if checks is None else counter.checks + checks
+        rng = random.Random(seed)
+        estimates = []
+        for r in range(rounds):
+            if r > 0 and stop is not None and counter.checks >= stop:
+                break
+            xors = [counter.random_xor(rng, density) for j in range(len(bits))]
+            counts = {0: counts[0]} if 0 in counts else {}
+
+            def cell(j, stop=stop):
+                if j not in counts:
+                    counts[j] = counter.count_cell(xors[:j], limit, active, stop)
+                return counts[j]
+            # Gallop away from m to bracket the smallest m with a small
+            # enough cell between lo (too big) and hi, then bisect, until a
+            # cell runs out of solver calls (the first one always settles)
+            lo = hi = None
+            j, step = m, 1
+            c = cell(j, None)
+            while c is not None:
+                if c > limit:
+                    lo = j
+                else:
+                    hi = j
+                if hi is None and j < len(bits):
+                    j = min(len(bits), j + step)
+                    step *= 2
+                elif lo is None and j > 0:
+                    j = max(0, j - step)
+                    step *= 2
+                elif lo is not None and hi is not None and hi - lo > 1:
+                    j = (lo + hi) // 2
+                else:
+                    break
+                c = cell(j)
+            if hi is not None:
+                m = hi
+                estimates.append(cell(hi) * 2 ** hi)
+            elif lo is not None:
+                m = lo
+                estimates.append((limit + 1) * 2 ** lo)
+        counter.m = m
+        estimates.sort()
+        return estimates[len(estimates) // 2]
+
+    # Colors that were never guessed appear in no response, so any
+    # permutation of them maps codes to codes with the same feedback. Value
+    # precedence keeps one code per class: with the unused colors
+    # u_1 < u_2 < ..., peg 0 is not u_2, u_3, ... and u_(j+1) may only sit at
+    # peg i if u_j sits at an earlier peg. Each adjacent pair (u_j, u_(j+1))
+    # has its own guard prec_<u_j>_<u_(j+1)>; as guesses use up colors the
+    # chain changes and only its new pairs need constraints. Returns the
+    # guards of the current chain, to be passed to check() as assumptions.
+    def symmetry_guard(self):
+        if not self.symmetry:
+            return []
+        used = set(c for g in self.guess_list for c in g)
+        unused = [c for c in range(self.n) if c not in used]
+        guards = []
+        for j in range(1, len(unused)):
+            a, b = unused[j - 1], unused[j]
+            if (a, b) not in self.precedence:
+                guard = Bool("prec_{}_{}".format(a, b), self.ctx)
+                first = self.first_peg(a)
+                cons = [Or(Not(self.eq(i, b)), first[i]) for i in range(1, self.k)]
+                self.s.add(Or(Not(guard), And([Not(self.eq(0, b))] + cons)))
+                self.precedence[(a, b)] = guard
+            guards.append(self.precedence[(a, b)])
+        return guards
+
+    # first_peg(c)[i] holds iff color c is on one of the pegs 0 .. i - 1
+    def first_peg(self, c):
+        if c in self.prefix:
+            return self.prefix[c]
+        prev = [None, self.eq(0, c)]
+        for i in range(2, self.k):
+            r = FreshBool(ctx=self.ctx)
+            cons = r == Or(prev[i - 1], self.eq(i - 1, c))
+            self.base_cons.append(cons)
+            self.s.add(cons)
+            prev.append(r)
+        self.prefix[c] = prev
+        return prev
+
+    # Unary count of color c in the code: counts[c][m - 1] holds iff at least
+    # m pegs have color c. Built once per color by a sequential counter over
+    # the pegs (O(k^2) definitions, kept in base_cons) and shared by every
+    # guess.
+    def color_count(self, c):
+        if c in self.counts:
+            return self.counts[c]
+        prev = []
+        for i in range(self.k):
+            x = self.eq(i, c)
+            cur = []
+            for m in range(i + 1):
+                if i == self.k - 1:
+                    r = Bool("cnt_{}_{}".format(c, m + 1), self.ctx)
+                else:
+                    r = FreshBool(ctx=self.ctx)
+                if m == 0:
+                    base = x if i == 0 else Or(prev[0], x)
+                elif m == i:
+                    base = And(prev[m - 1], x)
+                else:
+                    base = Or(prev[m], And(prev[m - 1], x))
+                cons = r == base
+                self.base_cons.append(cons)
+                self.s.add(cons)
+                cur.append(r)
+            prev = cur
+        self.counts[c] = prev
+        return prev
+
+    # Helper function for white: red + white is the number of matched pegs,
+    # sum over the guessed colors c of min(#c in guess, #c in code). With the
+    # unary counts that min is just the first #c-in-guess count literals, so
+    # the constraint has at most k terms.
+    def white_cons(self, ls, matches):
+        terms = []
+        for c in set(ls):
+            for m in range(ls.count(c)):
+                terms.append((self.color_count(c)[m], 1))
+        return PbEq(terms, matches)
+
+
+# Weight of a response's soft clause: the log-odds that it is right, scaled
+# to an integer. Rates of one half or more still keep a unit weight.
+def response_weight(rate):
+    if rate >= 0.5:
+        return 1
+    return max(1, round(10 * math.log((1 - rate) / rate)))
+
+
+# mastermind.initialize(n,k) called in harness; the keyword arguments are
+# those of MastermindPlayer
+def initialize(n_, k_, amo_=None, mode_="exact", error_rate_=0.5, backend_=None,
+               strategy_="first", symmetry_=False, noise_="harness", encoding_=None, book_=True):
+    global player
+    player = MastermindPlayer(n_, k_, amo_, mode_, error_rate_, backend_, strategy_, symmetry_, noise_,
+                              encoding_, book_)
+
+
+# mastermind.put_first_player_response(red,white) called in harness
+def put_first_player_response(red, white):
+    return player.put_first_player_response(red, white)
+
+
+# mastermind.get_second_player_move() called in harness
+def get_second_player_move():
+    return player.get_second_player_move()
@@ -0,0 +1,209 @@
+import numpy as np
+import mastermind_filter
+import mastermind_knuth
+
+# Bayesian player for a lying first player. Every candidate code carries the
+# log-likelihood of the responses seen so far under an explicit noise model,
+# updated in one vectorized pass per response, so a wrong response only
+# lowers the weight of the codes it rules out instead of removing them.
+# Games up to FULL_LIMIT codes weight the whole code space; bigger ones keep
+# a fixed set of particles that is resampled and moved (Metropolis steps
+# over the full history) when its weights degenerate. Same three-function
+# API as mastermind.py, which hands games to this module with
+# backend="bayes".
+#
+# Noise models, each with the error rate p:
+#   "harness": with probability p the first player scores [0] * k instead of
+#     the move (get_auto_response in mastermind-harness.py, p = 0.5)
+#   "uniform": with probability p the response is uniform over all valid
+#     (red, white) pairs
+
+# Largest n^k weighted code by code (8 bytes of weight per code)
+FULL_LIMIT = 10 ** 6
+# Particles kept for bigger games
+PARTICLES = 20000
+# Metropolis sweeps over the particles after each resampling
+MOVES = 5
+# Play the most likely code once it holds this much of the posterior
+CONFIDENT = 0.5
+# Most likely codes tried as guesses by the "info" strategy
+GUESSES = 100
+
+# Player behind the module-level API
+player = None
+
+
+# Mask over the response codes red * (k + 1) + white of the (red, white)
+# pairs that can actually come back ((k - 1, 1) cannot)
+def valid_responses(k):
+    mask = np.zeros((k + 1) * (k + 1), dtype=bool)
+    for red in range(k + 1):
+        for white in range(k + 1 - red):
+            if not (red == k - 1 and white == 1):
+                mask[red * (k + 1) + white] = True
+    return mask
+
+
+# Entropy in bits of each row of a (rows, outcomes) array of probabilities
+def entropy(p):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=-1)
+
+
+# One game; strategy is "map" (or "first": the most likely code, lowest
+# index among ties) or "info" (the guess whose response tells the most about
+# the code, by mutual information under the noise model)
+class BayesPlayer:
+    __slots__ = ("k", "n", "noise", "rate", "strategy", "codes", "loglik", "base",
+                 "particles", "rng", "valid", "move", "guess_list", "response_list")
+
+    def __init__(self, n, k, noise="harness", rate=0.5, strategy="map", particles=None, seed=0):
+        if noise not in ("harness", "uniform"):
+            raise Exception("Unknown noise model " + str(noise))
+        if strategy not in ("first", "map", "info"):
+            raise Exception("Unknown strategy " + str(strategy))
+        self.k = k
+        self.n = n
+        self.noise = noise
+        self.rate = rate
+        self.strategy = strategy
+        self.rng = np.random.default_rng(seed)
+        self.valid = valid_responses(k)
+        self.particles = particles is not None or n ** k > FULL_LIMIT
+        if self.particles:
+            dtype = np.uint8 if n <= 256 else np.uint16
+            self.codes = self.rng.integers(0, n, (k, particles or PARTICLES)).astype(dtype)
+        else:
+            self.codes = mastermind_filter.code_space(n, k)
+        self.loglik = np.zeros(self.codes.shape[1])
+        # Log-likelihood of each particle when it was last resampled; the
+        # particle weights are loglik - base
+        self.base = np.zeros(self.codes.shape[1])
+        self.move = []
+        self.guess_list = []
+        self.response_list = []
+
+    # P(response | code) for every code, response given as red * (k + 1) +
+    # white, after playing move
+    def likelihood(self, codes, move, response):
+        p = self.rate
+        hit = (mastermind_knuth.score_codes(codes, move, self.k) == response).astype(np.float64)
+        if self.noise == "harness":
+            zero = mastermind_knuth.score_codes(codes, [0] * self.k, self.k) == response
+            return (1 - p) * hit + p * zero
+        return (1 - p) * hit + p / self.valid.sum()
+
+    # Log-likelihood of codes under every response so far
+    def history_loglik(self, codes):
+        total = np.zeros(codes.shape[1])
+        with np.errstate(divide="ignore"):
+            for move, (red, white) in zip(self.guess_list, self.response_list):
+                total += np.log(self.likelihood(codes, move, red * (self.k + 1) + white))
+        return total
+
+    def put_first_player_response(self, red, white):
+        self.response_list.append((red, white))
+        with np.errstate(divide="ignore"):
+            self.loglik += np.log(self.likelihood(self.codes, self.move, red * (self.k + 1) + white))
+        if self.particles:
+            weights = self.weights()
+            if 1.0 / (weights ** 2).sum() < len(weights) / 2:
+                self.rejuvenate(weights)
+        elif np.isneginf(self.loglik.max()):
+            # Only possible with rate 0 and a lying first player: the
+            # responses contradict each other, start over
+            self.loglik[:] = 0.0
+
+    # Resample the particles by weight, then move each one by Metropolis
+    # steps that recolor one peg, accepted by the likelihood of the whole
+    # history
+    def rejuvenate(self, weights):
+        count = len(weights)
+        if np.isnan(weights).any():
+            picks = np.arange(count)
+        else:
+            positions = (self.rng.random() + np.arange(count)) / count
+            picks = np.minimum(np.searchsorted(np.cumsum(weights), positions), count - 1)
+        codes = self.codes[:, picks]
+        loglik = self.loglik[picks]
+        for step in range(MOVES * self.k):
+            proposal = codes.copy()
+            pegs = self.rng.integers(0, self.k, count)
+            proposal[pegs, np.arange(count)] = self.rng.integers(0, self.n, count)
+            new = self.history_loglik(proposal)
+            with np.errstate(invalid="ignore", over="ignore"):
+                accept = np.isneginf(loglik) | (np.log(self.rng.random(count)) < new - loglik)
+            codes[:, accept] = proposal[:, accept]
+            loglik[accept] = new[accept]
+        self.codes = codes
+        self.loglik = loglik
+        self.base = loglik.copy()
+
+    # Normalized posterior weight of every code (or particle)
+    def weights(self):
+        logw = self.loglik - self.base
+        top = logw.max()
+        if np.isneginf(top):
+            return np.full(len(logw), np.nan)
+        w = np.exp(logw - top)
+        return w / w.sum()
+
+    def stats(self):
+        weights = np.nan_to_num(self.weights())
+        return {"responses": len(self.response_list),
+                "candidates": int(np.count_nonzero(weights)), "map": float(weights.max())}
+
+    def get_second_player_move(self):
+        best = int(np.argmax(self.loglik))
+        if self.strategy == "info" and self.guess_list:
+            weights = self.weights()
+            if not np.isnan(weights).any() and weights[best] < CONFIDENT:
+                best = self.most_informative(weights)
+        self.move = [int(d) for d in self.codes[:, best]]
+        self.guess_list.append(self.move)
+        return self.move
+
+    # The guess maximizing the mutual information between its response and
+    # the code, estimated over mastermind_knuth.SAMPLES codes drawn from the
+    # posterior. The candidates are the most likely code and the first
+    # GUESSES distinct draws; ties go to the likelier guess.
+    def most_informative(self, weights):
+        sample = self.rng.choice(len(weights), mastermind_knuth.SAMPLES, p=weights)
+        drawn = np.unique(sample)
+        drawn = drawn[np.argsort(-weights[drawn], kind="stable")]
+        guesses = np.unique(np.concatenate([[np.argmax(self.loglik)], drawn[:GUESSES]]))
+        guesses = guesses[np.argsort(-weights[guesses], kind="stable")]
+        codes = self.codes[:, sample]
+        w = np.full(len(sample), 1.0 / len(sample))
+        p = self.rate
+        responses = (self.k + 1) * (self.k + 1)
+        zero = mastermind_knuth.score_codes(codes, [0] * self.k, self.k)
+        gain = np.empty(len(guesses))
+        for j in range(len(guesses)):
+            scores = mastermind_knuth.score_codes(codes, self.codes[:, guesses[j]], self.k)
+            predictive = (1 - p) * np.bincount(scores, weights=w, minlength=responses)
+            if self.noise == "harness":
+                predictive += p * np.bincount(zero, weights=w, minlength=responses)
+                # The response is certain for a code only where the move and
+                # [0] * k score the same
+                noisy = w[scores != zero].sum() * entropy(np.array([p, 1 - p]))
+            else:
+                # H(response | code) is the same for every code and guess
+                predictive += p * self.valid / self.valid.sum()
+                noisy = 0.0
+            gain[j] = entropy(predictive) - noisy
+        pick = np.lexsort((np.arange(len(guesses)), -np.round(gain, 9)))[0]
+        return int(guesses[pick])
+
+
+def initialize(n_, k_, noise_="harness", rate_=0.5, strategy_="map"):
+    global player
+    player = BayesPlayer(n_, k_, noise_, rate_, strategy_)
+
+
+def put_first_player_response(red, white):
+    return player.put_first_player_response(red, white)
+
+
+def get_second_player_move():
+    return player.get_second_player_move()
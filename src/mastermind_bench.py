@@ -0,0 +1,519 @@
+#!/usr/bin/python3
+
+# benchmarks for the mastermind player, e.g.
+#   ./mastermind_bench.py amo --n 8 16 32 64 --k 4 6
+#   ./mastermind_bench.py noise --n 8 --k 4 --rate 0.2 0.5 --mode maxsat bayes-map
+#   ./mastermind_bench.py strategy --n 6 --k 4
+#   ./mastermind_bench.py pool --games 1000 --kind thread process
+#   ./mastermind_bench.py encoding --n 8 16 32 64 --k 4 6
+#   ./mastermind_bench.py backend --n 6 8 10 12 --k 4 5 6 7
+#   ./mastermind_bench.py count --n 8 12 --k 5 6 --limit 16 32 --density 0.3 0.5 --checks 0 160
+#   ./mastermind_bench.py startup --n 8 32 64 --k 4 8
+#   ./mastermind_bench.py symmetry --n 12 16 --k 8 10 --noise 0.3
+#   ./mastermind_bench.py games --n 8 10 --k 4 6 --noise 0 0.5 --json out.json --csv out.csv
+
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import time
+import mastermind
+from mastermind_pool import PlayerPool, SessionPool, random_games, score
+from mastermind_server import percentiles
+
+
+# Play one game against code; returns the number of moves and the time the
+# player spent on them (choosing the move plus taking in the response; each
+# move's time is also appended to latencies). With probability noise the
+# first player scores [0] * k instead of the move, like get_auto_response in
+# mastermind-harness.py. The opening book is off unless book_=True is
+# passed, so the results do not depend on the book files in the cache.
+def play(n, k, code, noise=0.0, rng=None, max_moves=1000, latencies=None, **options):
+    options.setdefault("book_", False)
+    mastermind.initialize(n, k, **options)
+    moves = 0
+    solve_time = 0.0
+    red = 0
+    while red < k and moves < max_moves:
+        start = time.perf_counter()
+        move = mastermind.get_second_player_move()
+        elapsed = time.perf_counter() - start
+        moves += 1
+        if noise > 0 and rng.random() < noise:
+            move = [0] * k
+        red, white = score(move, code)
+        start = time.perf_counter()
+        mastermind.put_first_player_response(red, white)
+        elapsed += time.perf_counter() - start
+        solve_time += elapsed
+        if latencies is not None:
+            latencies.append(elapsed)
+    return moves, solve_time
+
+
+# Clause count and solve time of every at-most-one encoding on a (n, k) grid
+def amo_grid(ns, ks, games, seed, book=False):
+    rows = []
+    for n in ns:
+        for k in ks:
+            rng = random.Random(seed)
+            codes = [[rng.randrange(n) for i in range(k)] for g in range(games)]
+            for encoding in mastermind.AMO_ENCODINGS:
+                vs = [[mastermind.Bool("e_{}_{}".format(i, j)) for j in range(n)] for i in range(k)]
+                clauses = sum(len(mastermind.exactly_one(vs[i], encoding)) for i in range(k))
+                moves = 0
+                solve_time = 0.0
+                for code in codes:
+                    m, t = play(n, k, code, amo_=encoding, backend_="sat", encoding_="onehot", book_=book)
+                    moves += m
+                    solve_time += t
+                rows.append({"n": n, "k": k, "encoding": encoding, "clauses": clauses,
+                             "moves": moves / games, "solve_time": solve_time / games,
+                             "move_time": solve_time / moves})
+    return rows
+
+
+# Variables (Boolean width for bitvec), clauses and solve time of every code
+# encoding on a (n, k) grid, with the fastest one of each cell marked. The
+# encodings play different moves, so fastest goes by time per move.
+def encoding_grid(ns, ks, games, seed, book=False):
+    rows = []
+    for n in ns:
+        for k in ks:
+            rng = random.Random(seed)
+            codes = [[rng.randrange(n) for i in range(k)] for g in range(games)]
+            cell = []
+            for encoding in mastermind.CODE_ENCODINGS:
+                player = mastermind.MastermindPlayer(n, k, backend="sat", encoding=encoding)
+                clauses = sum(len(mastermind.peg_vars(i, n, encoding, player.amo)[1]) for i in range(k))
+                if encoding in ("onehot", "order"):
+                    variables = len(player.vs[0]) * k
+                elif encoding == "bitvec":
+                    variables = max(1, (n - 1).bit_length()) * k
+                else:
+                    variables = k
+                moves = 0
+                solve_time = 0.0
+                for code in codes:
+                    m, t = play(n, k, code, backend_="sat", encoding_=encoding, book_=book)
+                    moves += m
+                    solve_time += t
+                cell.append({"n": n, "k": k, "encoding": encoding,
+                             "variables": variables,
+                             "clauses": clauses, "moves": moves / games,
+                             "solve_time": solve_time / games, "move_time": solve_time / moves,
+                             "fastest": False})
+            min(cell, key=lambda row: row["move_time"])["fastest"] = True
+            rows.extend(cell)
+    return rows
+
+
+# Accuracy, latency and solver calls of MastermindPlayer.candidates for
+# each (limit, rounds, density, checks budget; 0 for none) against the
+# exact count of consistent codes, taken from the NumPy code space, after
+# every move of noise-free SAT games
+def count_grid(ns, ks, limits, rounds, densities, budgets, games, seed, encoding=None):
+    import numpy as np
+    import mastermind_filter
+    rows = []
+    for n, k in itertools.product(ns, ks):
+        codes = mastermind_filter.code_space(n, k)
+        for limit, r, density, budget in itertools.product(limits, rounds, densities, budgets):
+            rng = random.Random(seed)
+            errors = []
+            latencies = []
+            checks = 0
+            for g in range(games):
+                code = [rng.randrange(n) for i in range(k)]
+                player = mastermind.MastermindPlayer(n, k, backend="sat", encoding=encoding, book=False)
+                alive = np.ones(codes.shape[1], dtype=bool)
+                red = 0
+                while red < k:
+                    move = player.get_second_player_move()
+                    red, white = score(move, code)
+                    player.put_first_player_response(red, white)
+                    reds, whites = mastermind_filter.score_all(codes, move)
+                    alive &= (reds == red) & (whites == white)
+                    before = player.counter.checks if player.counter is not None else 0
+                    start = time.perf_counter()
+                    estimate = player.candidates(limit, r, seed=g, density=density, checks=budget or None)
+                    latencies.append(time.perf_counter() - start)
+                    checks += player.counter.checks - before
+                    exact = int(alive.sum())
+                    errors.append(abs(estimate - exact) / exact)
+            rows.append({"n": n, "k": k, "encoding": player.encoding, "limit": limit, "rounds": r,
+                         "density": density, "budget": budget, "counts": len(errors),
+                         "checks_mean": checks / len(errors), "error_mean": sum(errors) / len(errors),
+                         "error_max": max(errors), "latency_mean": sum(latencies) / len(latencies),
+                         "latency_max": max(latencies)})
+        mastermind_filter.spaces.pop((n, k), None)
+    return rows
+
+
+# Time to get a player for a new game: built from scratch (base-constraint
+# template dropped first), translated from the cached template, and checked
+# out of a warm PlayerPool (given time to refill between games, as a server
+# would have while games are played)
+def startup_grid(ns, ks, encodings, games):
+    rows = []
+    for n in ns:
+        for k in ks:
+            for encoding in encodings:
+                options = {"backend": "sat", "encoding": encoding}
+                amo = mastermind.default_amo(n)
+                times = {"scratch": [], "template": [], "pool": []}
+                for g in range(games):
+                    mastermind.templates.pop((n, k, encoding, amo), None)
+                    start = time.perf_counter()
+                    mastermind.MastermindPlayer(n, k, **options)
+                    times["scratch"].append(time.perf_counter() - start)
+                for g in range(games):
+                    start = time.perf_counter()
+                    mastermind.MastermindPlayer(n, k, **options)
+                    times["template"].append(time.perf_counter() - start)
+                with PlayerPool(2) as pool:
+                    pool.warm(n, k, **options)
+                    for g in range(games):
+                        key = (n, k, tuple(sorted(options.items())))
+                        while len(pool.ready.get(key, ())) < pool.size:
+                            time.sleep(0.001)
+                        start = time.perf_counter()
+                        pool.checkout(n, k, **options)
+                        times["pool"].append(time.perf_counter() - start)
+                for how in times:
+                    row = {"n": n, "k": k, "encoding": encoding, "startup": how,
+                           "mean": sum(times[how]) / games}
+                    row.update(percentiles(times[how], (50, 99)))
+                    rows.append(row)
+    return rows
+
+
+# Solver time with and without symmetry breaking between never-guessed
+# colors. Both players see the same games: the one without symmetry
+# breaking picks the moves, both are asked for a solution in every state and
+# get the same responses (lies included, at rate noise), so their check()
+# times are compared on identical constraint sets.
+def symmetry_grid(ns, ks, noise, mode, games, seed):
+    rows = []
+    for n in ns:
+        for k in ks:
+            rng = random.Random(seed)
+            times = {False: [], True: []}
+            for g in range(games):
+                code = [rng.randrange(n) for i in range(k)]
+                players = {s: mastermind.MastermindPlayer(n, k, backend="sat", mode=mode, symmetry=s, book=False)
+                           for s in times}
+                red = 0
+                while red < k:
+                    move = [0] * k
+                    for symmetry in times:
+                        player = players[symmetry]
+                        if player.guess_list:
+                            start = time.perf_counter()
+                            solution = player.get_a_solution()
+                            times[symmetry].append(time.perf_counter() - start)
+                            if not symmetry:
+                                move = solution
+                    answered = [0] * k if noise > 0 and rng.random() < noise else move
+                    for player in players.values():
+                        player.move = move
+                        player.guess_list.append(move)
+                        player.put_first_player_response(*score(answered, code))
+                    red = score(move, code)[0]
+            for symmetry in times:
+                row = {"n": n, "k": k, "noise": noise, "symmetry": symmetry, "checks": len(times[symmetry]),
+                       "solve_time": sum(times[symmetry]) / games, "worst": max(times[symmetry], default=0.0)}
+                row.update(percentiles(times[symmetry]))
+                rows.append(row)
+    return rows
+
+
+# Players compared by the noise bench: the SAT player's two ways of handling
+# responses and the Bayesian player's two guess strategies
+NOISE_MODES = {
+    "exact": {"backend_": "sat", "mode_": "exact"},
+    "maxsat": {"backend_": "sat", "mode_": "maxsat"},
+    "bayes-map": {"backend_": "bayes", "strategy_": "map"},
+    "bayes-info": {"backend_": "bayes", "strategy_": "info"},
+}
+
+
+# Moves per game of each response-handling mode against a lying first player
+def noise_grid(ns, ks, rates, games, seed, modes=tuple(NOISE_MODES), book=False):
+    rows = []
+    for n in ns:
+        for k in ks:
+            for rate in rates:
+                for mode in modes:
+                    rng = random.Random(seed)
+                    moves = 0
+                    solve_time = 0.0
+                    for g in range(games):
+                        code = [rng.randrange(n) for i in range(k)]
+                        m, t = play(n, k, code, rate, rng, error_rate_=rate, book_=book, **NOISE_MODES[mode])
+                        moves += m
+                        solve_time += t
+                    rows.append({"n": n, "k": k, "rate": rate, "mode": mode,
+                                 "moves": moves / games, "solve_time": solve_time / games})
+    return rows
+
+
+# Average guesses per noise-free game of the filter player's strategies; by
+# default over every code (the standard benchmark for n=6, k=4 is all 1296)
+def strategy_grid(ns, ks, strategies, games, seed, book=False):
+    rows = []
+    for n in ns:
+        for k in ks:
+            rng = random.Random(seed)
+            if games is None:
+                codes = list(itertools.product(range(n), repeat=k))
+            else:
+                codes = [[rng.randrange(n) for i in range(k)] for g in range(games)]
+            for strategy in strategies:
+                moves = []
+                solve_time = 0.0
+                for code in codes:
+                    m, t = play(n, k, list(code), backend_="filter", strategy_=strategy, book_=book)
+                    moves.append(m)
+                    solve_time += t
+                rows.append({"n": n, "k": k, "strategy": strategy, "games": len(codes),
+                             "moves": sum(moves) / len(codes), "worst": max(moves),
+                             "solve_time": solve_time / len(codes)})
+    return rows
+
+
+# Throughput of many concurrent sessions on thread and process pools
+def pool_grid(n, k, games, kinds, workers, noise, backend, seed, book=False):
+    rows = []
+    for kind in kinds:
+        with SessionPool(workers, kind) as pool:
+            moves, stats = pool.run(random_games(games, n, k, noise, seed, {"backend": backend, "book": book}))
+        stats.update({"kind": kind, "workers": pool.workers})
+        rows.append(stats)
+    return rows
+
+
+# One cell of the games grid. Every game has its own seed derived from the
+# cell, so any cell can be rerun alone and gives the same games.
+def games_cell(n, k, noise, games, seed, options):
+    moves = []
+    latencies = []
+    terms = []
+    failed = 0
+    for g in range(games):
+        rng = random.Random("{}:{}:{}:{}:{}".format(seed, n, k, noise, g))
+        code = [rng.randrange(n) for i in range(k)]
+        m, t = play(n, k, code, noise, rng, latencies=latencies, **options)
+        moves.append(m)
+        stats = mastermind.player.stats()
+        if "terms" in stats:
+            terms.append(stats["terms"])
+        failed += mastermind.player.guess_list[-1] != code
+    row = {"n": n, "k": k, "noise": noise, "games": games, "seed": seed,
+           "moves_mean": sum(moves) / games, "moves_max": max(moves), "unsolved": failed,
+           "moves": moves, "latency_mean": sum(latencies) / len(latencies),
+           "terms_mean": sum(terms) / len(terms) if terms else None, "terms_max": max(terms, default=None)}
+    for key, value in percentiles(latencies).items():
+        row["latency_" + key] = value
+    # KiB on Linux
+    row["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return row
+
+
+def run_cell(args):
+    return games_cell(*args)
+
+
+# Games grid over (n, k, noise rate). Each cell runs in a fresh process so the
+# peak memory is its own and no state leaks from one cell to the next.
+def games_grid(ns, ks, rates, games, seed, options):
+    cells = [(n, k, rate, games, seed, options) for n in ns for k in ks for rate in rates]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        return pool.map(run_cell, cells, chunksize=1)
+
+
+# Per-move time and peak memory of the filter and SAT backends on the same
+# seeded noise-free games, to place mastermind.FILTER_LIMIT; cells are
+# ordered by n^k and each runs in its own process (see games_grid)
+def backend_grid(ns, ks, backends, games, seed):
+    rows = []
+    for n, k in sorted(itertools.product(ns, ks), key=lambda cell: (cell[0] ** cell[1], cell)):
+        cell = []
+        for backend in backends:
+            options = {"backend_": backend, "mode_": "exact"}
+            row = games_grid([n], [k], [0.0], games, seed, options)[0]
+            row.update({"backend": backend, "codes": n ** k, "fastest": False})
+            cell.append(row)
+        min(cell, key=lambda row: row["latency_mean"])["fastest"] = True
+        rows.extend(cell)
+    return rows
+
+
+def write_csv(rows, out):
+    fields = [key for key in rows[0] if key != "moves"]
+    writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the mastermind player")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    amo = sub.add_parser("amo", help="at-most-one encodings of the one-hot pegs")
+    amo.add_argument("--n", type=int, nargs="+", default=[8, 16, 32, 64])
+    amo.add_argument("--k", type=int, nargs="+", default=[4, 6])
+    amo.add_argument("--games", type=int, default=3)
+    amo.add_argument("--seed", type=int, default=0)
+    noise = sub.add_parser("noise", help="SAT and Bayesian play against a lying first player")
+    noise.add_argument("--n", type=int, nargs="+", default=[8])
+    noise.add_argument("--k", type=int, nargs="+", default=[4])
+    noise.add_argument("--rate", type=float, nargs="+", default=[0.1, 0.3, 0.5])
+    noise.add_argument("--mode", nargs="+", default=list(NOISE_MODES), choices=list(NOISE_MODES))
+    noise.add_argument("--games", type=int, default=5)
+    noise.add_argument("--seed", type=int, default=0)
+    encoding = sub.add_parser("encoding", help="code-variable encodings of the pegs")
+    encoding.add_argument("--n", type=int, nargs="+", default=[8, 16, 32, 64])
+    encoding.add_argument("--k", type=int, nargs="+", default=[4, 6])
+    encoding.add_argument("--games", type=int, default=3)
+    encoding.add_argument("--seed", type=int, default=0)
+    backend = sub.add_parser("backend", help="per-move time of the filter and SAT backends by n^k")
+    backend.add_argument("--n", type=int, nargs="+", default=[6, 8, 10, 12])
+    backend.add_argument("--k", type=int, nargs="+", default=[4, 5, 6, 7])
+    backend.add_argument("--backend", nargs="+", default=["filter", "sat"])
+    backend.add_argument("--games", type=int, default=4)
+    backend.add_argument("--seed", type=int, default=0)
+    count = sub.add_parser("count", help="accuracy and latency of candidate counting")
+    count.add_argument("--n", type=int, nargs="+", default=[8, 12])
+    count.add_argument("--k", type=int, nargs="+", default=[5, 6])
+    count.add_argument("--limit", type=int, nargs="+", default=[16, 32])
+    count.add_argument("--rounds", type=int, nargs="+", default=[1, 3])
+    count.add_argument("--density", type=float, nargs="+", default=[mastermind.COUNT_DENSITY])
+    count.add_argument("--checks", type=int, nargs="+", default=[mastermind.COUNT_CHECKS],
+                       help="solver-call budgets of a count (0 for none)")
+    count.add_argument("--encoding", default=None, help="code-variable encoding (default: by n)")
+    count.add_argument("--games", type=int, default=3)
+    count.add_argument("--seed", type=int, default=0)
+    startup = sub.add_parser("startup", help="cost of setting up a player for a new game")
+    startup.add_argument("--n", type=int, nargs="+", default=[8, 32, 64])
+    startup.add_argument("--k", type=int, nargs="+", default=[4, 8])
+    startup.add_argument("--encoding", nargs="+", default=["onehot", "bitvec"])
+    startup.add_argument("--games", type=int, default=20)
+    symmetry = sub.add_parser("symmetry", help="symmetry breaking between unused colors")
+    symmetry.add_argument("--n", type=int, nargs="+", default=[8, 16, 32])
+    symmetry.add_argument("--k", type=int, nargs="+", default=[4, 6])
+    symmetry.add_argument("--noise", type=float, default=0.0)
+    symmetry.add_argument("--mode", default="exact", help="exact or maxsat")
+    symmetry.add_argument("--games", type=int, default=5)
+    symmetry.add_argument("--seed", type=int, default=0)
+    strategy = sub.add_parser("strategy", help="guess selection of the filter player")
+    strategy.add_argument("--n", type=int, nargs="+", default=[6])
+    strategy.add_argument("--k", type=int, nargs="+", default=[4])
+    strategy.add_argument("--strategy", nargs="+", default=["first", "minimax", "expected"])
+    strategy.add_argument("--games", type=int, default=None, help="random codes per (n, k) instead of all")
+    strategy.add_argument("--seed", type=int, default=0)
+    pool = sub.add_parser("pool", help="throughput of concurrent sessions")
+    pool.add_argument("--n", type=int, default=8)
+    pool.add_argument("--k", type=int, default=4)
+    pool.add_argument("--games", type=int, default=200)
+    pool.add_argument("--kind", nargs="+", default=["thread", "process"])
+    pool.add_argument("--workers", type=int, default=None)
+    pool.add_argument("--noise", type=float, default=0.0)
+    pool.add_argument("--backend", default=None, help="sat or filter (default: by size)")
+    pool.add_argument("--seed", type=int, default=0)
+    games = sub.add_parser("games", help="seeded games over a (n, k, noise) grid")
+    games.add_argument("--n", type=int, nargs="+", default=[8, 10])
+    games.add_argument("--k", type=int, nargs="+", default=[4, 5])
+    games.add_argument("--noise", type=float, nargs="+", default=[0.0, 0.5])
+    games.add_argument("--games", type=int, default=10)
+    games.add_argument("--seed", type=int, default=0)
+    games.add_argument("--backend", default=None, help="sat or filter (default: by size)")
+    games.add_argument("--mode", default="exact", help="exact or maxsat")
+    games.add_argument("--json", default=None, help="write the rows as JSON here ('-' for stdout)")
+    games.add_argument("--csv", default=None, help="write the rows as CSV here ('-' for stdout)")
+    for name in ("amo", "noise", "encoding", "strategy", "pool", "games"):
+        sub.choices[name].add_argument("--book", action="store_true",
+                                       help="play openings from the cached mastermind_book files")
+    args = parser.parse_args()
+
+    if args.bench == "amo":
+        print("{:>4} {:>3} {:>10} {:>8} {:>7} {:>10} {:>10}".format(
+            "n", "k", "encoding", "clauses", "moves", "time", "per move"))
+        for row in amo_grid(args.n, args.k, args.games, args.seed, args.book):
+            print("{n:>4} {k:>3} {encoding:>10} {clauses:>8} {moves:>7.1f} {solve_time:>10.4f} {move_time:>10.5f}".format(**row))
+    elif args.bench == "noise":
+        print("{:>4} {:>3} {:>5} {:>10} {:>7} {:>10}".format("n", "k", "rate", "mode", "moves", "time"))
+        for row in noise_grid(args.n, args.k, args.rate, args.games, args.seed, args.mode, args.book):
+            print("{n:>4} {k:>3} {rate:>5.2f} {mode:>10} {moves:>7.1f} {solve_time:>10.4f}".format(**row))
+    elif args.bench == "encoding":
+        print("{:>4} {:>3} {:>8} {:>9} {:>8} {:>7} {:>10} {:>10}".format(
+            "n", "k", "encoding", "variables", "clauses", "moves", "time", "per move"))
+        for row in encoding_grid(args.n, args.k, args.games, args.seed, args.book):
+            print("{n:>4} {k:>3} {encoding:>8} {variables:>9} {clauses:>8} {moves:>7.1f} {solve_time:>10.4f} "
+                  "{move_time:>10.5f}{mark}".format(mark=" *" if row["fastest"] else "", **row))
+    elif args.bench == "backend":
+        print("{:>4} {:>3} {:>9} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            "n", "k", "codes", "backend", "mean ms", "p50 ms", "p99 ms", "rss KiB"))
+        for row in backend_grid(args.n, args.k, args.backend, args.games, args.seed):
+            print("{n:>4} {k:>3} {codes:>9} {backend:>7} {mean:>9.3f} {p50:>9.3f} {p99:>9.3f} {peak_rss_kb:>9}{mark}".format(
+                mean=1000 * row["latency_mean"], p50=1000 * row["latency_p50"], p99=1000 * row["latency_p99"],
+                mark=" *" if row["fastest"] else "", **row))
+    elif args.bench == "count":
+        print("{:>4} {:>3} {:>8} {:>6} {:>6} {:>7} {:>6} {:>6} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+            "n", "k", "encoding", "limit", "rounds", "density", "budget", "counts", "checks", "err mean", "err max",
+            "time", "max time"))
+        for row in count_grid(args.n, args.k, args.limit, args.rounds, args.density, args.checks, args.games,
+                              args.seed, args.encoding):
+            print("{n:>4} {k:>3} {encoding:>8} {limit:>6} {rounds:>6} {density:>7.2f} {budget:>6} {counts:>6} "
+                  "{checks_mean:>7.1f} {error_mean:>9.3f} {error_max:>9.3f} {latency_mean:>9.4f} "
+                  "{latency_max:>9.4f}".format(**row))
+    elif args.bench == "startup":
+        print("{:>4} {:>3} {:>8} {:>9} {:>10} {:>10} {:>10}".format(
+            "n", "k", "encoding", "startup", "mean ms", "p50 ms", "p99 ms"))
+        for row in startup_grid(args.n, args.k, args.encoding, args.games):
+            print("{n:>4} {k:>3} {encoding:>8} {startup:>9} {ms:>10.3f} {p50:>10.3f} {p99:>10.3f}".format(
+                ms=1000 * row["mean"], p50=1000 * row["p50"], p99=1000 * row["p99"],
+                **{key: row[key] for key in ("n", "k", "encoding", "startup")}))
+    elif args.bench == "symmetry":
+        print("{:>4} {:>3} {:>5} {:>8} {:>6} {:>10} {:>9} {:>9} {:>9}".format(
+            "n", "k", "noise", "symmetry", "checks", "time", "p50", "p99", "worst"))
+        for row in symmetry_grid(args.n, args.k, args.noise, args.mode, args.games, args.seed):
+            print("{n:>4} {k:>3} {noise:>5.2f} {symmetry!s:>8} {checks:>6} {solve_time:>10.4f} "
+                  "{p50:>9.5f} {p99:>9.5f} {worst:>9.5f}".format(**row))
+    elif args.bench == "strategy":
+        print("{:>4} {:>3} {:>9} {:>6} {:>7} {:>6} {:>10}".format("n", "k", "strategy", "games", "moves", "worst", "time"))
+        for row in strategy_grid(args.n, args.k, args.strategy, args.games, args.seed, args.book):
+            print("{n:>4} {k:>3} {strategy:>9} {games:>6} {moves:>7.3f} {worst:>6} {solve_time:>10.4f}".format(**row))
+    elif args.bench == "pool":
+        print("{:>8} {:>7} {:>6} {:>8} {:>8} {:>10}".format("kind", "workers", "games", "moves", "seconds", "games/s"))
+        for row in pool_grid(args.n, args.k, args.games, args.kind, args.workers, args.noise, args.backend, args.seed,
+                                 args.book):
+            print("{kind:>8} {workers:>7} {games:>6} {moves:>8} {seconds:>8.2f} {games_per_second:>10.1f}".format(**row))
+    elif args.bench == "games":
+        options = {"backend_": args.backend, "mode_": args.mode, "book_": args.book}
+        rows = games_grid(args.n, args.k, args.noise, args.games, args.seed, options)
+        if args.json is not None:
+            # nullcontext keeps the with block from closing stdout, which
+            # --csv - may still write to
+            with (contextlib.nullcontext(sys.stdout) if args.json == "-" else open(args.json, "w")) as out:
+                json.dump(rows, out, indent=2)
+                out.write("\n")
+        if args.csv is not None:
+            with (contextlib.nullcontext(sys.stdout) if args.csv == "-" else open(args.csv, "w", newline="")) as out:
+                write_csv(rows, out)
+        if args.json is None and args.csv is None:
+            print("{:>4} {:>3} {:>5} {:>7} {:>5} {:>9} {:>9} {:>9} {:>11} {:>9}".format(
+                "n", "k", "noise", "moves", "max", "p50", "p95", "p99", "terms", "rss KiB"))
+            for row in rows:
+                print("{n:>4} {k:>3} {noise:>5.2f} {moves_mean:>7.1f} {moves_max:>5} {latency_p50:>9.5f} "
+                      "{latency_p95:>9.5f} {latency_p99:>9.5f} {terms:>11} {peak_rss_kb:>9}".format(
+                          terms="-" if row["terms_mean"] is None else "{:.1f}".format(row["terms_mean"]), **row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+
+# Opening book: the moves a player policy makes after each sequence of up to
+# depth responses, precomputed offline by replaying the player, e.g.
+#   ./mastermind_book.py --n 8 --k 4 --depth 2 --backend sat
+# A response sequence is keyed by one int64 (see response_key). The book of
+# an (n, k, policy) is two .npy files in mastermind_knuth.CACHE_DIR, the
+# sorted keys and the move of each key, memory-mapped on first use, so a
+# lookup is a binary search and no solver call.
+
+import argparse
+import os
+import time
+import numpy as np
+import mastermind
+import mastermind_bayes
+import mastermind_knuth
+
+books = {}
+
+
+# Key of the response sequence key followed by (red, white). Each response
+# is one digit 1 .. (k + 1)^2 in base (k + 1)^2 + 1; the empty sequence is 0.
+def response_key(key, red, white, k):
+    return key * ((k + 1) * (k + 1) + 1) + red * (k + 1) + white + 1
+
+
+# Deepest book whose keys fit in an int64
+def max_depth(k):
+    depth = 0
+    while ((k + 1) * (k + 1) + 1) ** (depth + 1) < 2 ** 63:
+        depth += 1
+    return depth
+
+
+class Book:
+    __slots__ = ("keys", "moves")
+
+    def __init__(self, keys, moves):
+        self.keys = keys
+        self.moves = moves
+
+    # Move after the responses keyed by key, or None if they are not in the
+    # book
+    def move(self, key):
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        return [int(c) for c in self.moves[i]]
+
+
+def book_paths(n, k, policy):
+    prefix = os.path.join(mastermind_knuth.CACHE_DIR, "book_{}_{}_{}".format(n, k, policy))
+    return prefix + "_keys.npy", prefix + "_moves.npy"
+
+
+# The book of (n, k, policy), or None if none was built; loaded once
+def load(n, k, policy):
+    if (n, k, policy) not in books:
+        keys_path, moves_path = book_paths(n, k, policy)
+        book = None
+        if os.path.exists(keys_path) and os.path.exists(moves_path):
+            book = Book(np.load(keys_path, mmap_mode="r"), np.load(moves_path, mmap_mode="r"))
+        books[(n, k, policy)] = book
+    return books[(n, k, policy)]
+
+
+# Walk every sequence of up to depth valid responses (right or not, so the
+# book also covers a lying first player) and record the move a fresh player
+# with these options makes after it. Returns the policy and the sorted keys
+# and moves.
+def build(n, k, depth, options):
+    if depth > max_depth(k):
+        raise Exception("Book keys for k = {} only fit up to depth {}".format(k, max_depth(k)))
+    valid = np.flatnonzero(mastermind_bayes.valid_responses(k))
+    responses = [(int(r) // (k + 1), int(r) % (k + 1)) for r in valid if r != k * (k + 1)]
+    entries = {}
+    policy = None
+    stack = [(0, [])]
+    while stack:
+        key, history = stack.pop()
+        player = mastermind.MastermindPlayer(n, k, book=False, **options)
+        policy = player.policy
+        for red, white in history:
+            player.get_second_player_move()
+            player.put_first_player_response(red, white)
+        entries[key] = player.get_second_player_move()
+        if len(history) < depth:
+            for red, white in responses:
+                stack.append((response_key(key, red, white, k), history + [(red, white)]))
+    keys = np.array(sorted(entries), dtype=np.int64)
+    moves = np.array([entries[key] for key in keys], dtype=np.uint8 if n <= 256 else np.uint16)
+    return policy, keys, moves
+
+
+def save(n, k, policy, keys, moves):
+    os.makedirs(mastermind_knuth.CACHE_DIR, exist_ok=True)
+    for path, array in zip(book_paths(n, k, policy), (keys, moves)):
+        tmp = path + ".{}.tmp".format(os.getpid())
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    books.pop((n, k, policy), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book of a mastermind player")
+    parser.add_argument("--n", type=int, required=True)
+    parser.add_argument("--k", type=int, required=True)
+    parser.add_argument("--depth", type=int, default=2, help="responses covered by the book")
+    parser.add_argument("--backend", default=None, help="sat, filter or bayes (default: by size)")
+    parser.add_argument("--mode", default="exact", help="exact or maxsat")
+    parser.add_argument("--strategy", default="first")
+    parser.add_argument("--encoding", default=None)
+    parser.add_argument("--error-rate", type=float, default=0.5)
+    args = parser.parse_args()
+
+    options = {"backend": args.backend, "mode": args.mode, "strategy": args.strategy,
+               "encoding": args.encoding, "error_rate": args.error_rate}
+    start = time.perf_counter()
+    policy, keys, moves = build(args.n, args.k, args.depth, options)
+    save(args.n, args.k, policy, keys, moves)
+    print("{} moves for {} in {:.1f}s: {}".format(len(keys), policy, time.perf_counter() - start,
+                                                 book_paths(args.n, args.k, policy)[0]))
+
+
+if __name__ == "__main__":
+    main()
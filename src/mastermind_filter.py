@@ -0,0 +1,104 @@
+import numpy as np
+import mastermind_knuth
+
+# Consistency-filter player for small games (n^k up to
+# mastermind.FILTER_LIMIT): the whole
+# code space is kept as a NumPy array and every response is checked against
+# all codes in one vectorized pass. Same three-function API as mastermind.py,
+# which switches to this module by itself for small enough games.
+
+# Player behind the module-level API
+player = None
+
+spaces = {}
+
+
+# All n^k codes as a (k, n^k) array, code j in column j (peg i is digit i of
+# j in base n). Built once per (n, k) and shared read-only by all sessions.
+def code_space(n_, k_):
+    if (n_, k_) in spaces:
+        return spaces[(n_, k_)]
+    dtype = np.uint8 if n_ <= 256 else np.uint16
+    idx = np.arange(n_ ** k_, dtype=np.int64)
+    codes = np.empty((k_, n_ ** k_), dtype=dtype)
+    for i in range(k_):
+        codes[i] = idx % n_
+        idx //= n_
+    codes.setflags(write=False)
+    spaces[(n_, k_)] = codes
+    return codes
+
+
+# size codes drawn uniformly at random (with a fixed seed), laid out like
+# code_space: mastermind.py estimates large candidate counts from them
+def sample_codes(n_, k_, size, seed=0):
+    dtype = np.uint8 if n_ <= 256 else np.uint16
+    return np.random.default_rng(seed).integers(0, n_, size=(k_, size)).astype(dtype)
+
+
+# (red, white) of guess against every column of codes: red counts equal
+# pegs, red + white is the sum over the guessed colors c of
+# min(#c in guess, #c in code)
+def score_all(codes, guess):
+    guess = np.asarray(guess)
+    red = (codes == guess[:, None]).sum(axis=0, dtype=np.uint8)
+    matches = np.zeros(codes.shape[1], dtype=np.uint8)
+    colors, times = np.unique(guess, return_counts=True)
+    for c, t in zip(colors, times):
+        matches += np.minimum((codes == c).sum(axis=0, dtype=np.uint8), np.uint8(t))
+    return red, matches - red
+
+
+# One game; strategy is "first" (first least-missed code) or a
+# mastermind_knuth criterion, "minimax" or "expected"
+class FilterPlayer:
+    __slots__ = ("k", "n", "digits", "miss", "move", "guess_list", "response_list", "strategy")
+
+    def __init__(self, n, k, strategy="first"):
+        self.k = k
+        self.n = n
+        self.strategy = strategy
+        self.digits = code_space(n, k)
+        self.miss = np.zeros(self.digits.shape[1], dtype=np.uint16)
+        self.move = []
+        self.guess_list = []
+        self.response_list = []
+
+    # Every code that disagrees with the response gets one more miss; codes
+    # that agree with all responses have none. Wrong responses only add
+    # misses, so the least-missed codes are the ones violating the fewest
+    # responses.
+    def put_first_player_response(self, red, white):
+        self.response_list.append((red, white))
+        r, w = score_all(self.digits, self.move)
+        self.miss += (r != red) | (w != white)
+
+    def stats(self):
+        return {"responses": len(self.response_list),
+                "candidates": int((self.miss == self.miss.min()).sum())}
+
+    # The first code with the fewest misses ([0] * k on an empty history), or
+    # the best splitting guess among all codes under the minimax/expected
+    # strategy
+    def get_second_player_move(self):
+        if self.strategy == "first":
+            best = int(np.argmin(self.miss))
+        else:
+            alive = np.flatnonzero(self.miss == self.miss.min())
+            best = mastermind_knuth.choose_guess(self.digits, alive, self.n, self.k, self.strategy)
+        self.move = [int(d) for d in self.digits[:, best]]
+        self.guess_list.append(self.move)
+        return self.move
+
+
+def initialize(n_, k_, strategy_="first"):
+    global player
+    player = FilterPlayer(n_, k_, strategy_)
+
+
+def put_first_player_response(red, white):
+    return player.put_first_player_response(red, white)
+
+
+def get_second_player_move():
+    return player.get_second_player_move()
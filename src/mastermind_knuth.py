@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import mastermind_filter
+
+# Guess selection for the filter player: instead of the first consistent
+# code, play the guess whose worst-case (Knuth's minimax) or expected
+# partition of the remaining candidates is smallest. Scores come from a
+# candidates x guesses table that is built once per (n, k) and memoized to
+# disk; games too big for a table score a random sample instead.
+
+# Largest n^k with a full score table (n^k x n^k bytes)
+TABLE_LIMIT = 4096
+# Guesses and candidates looked at when there is no table
+SAMPLES = 1000
+
+CACHE_DIR = os.environ.get("MASTERMIND_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "mastermind"))
+
+tables = {}
+
+
+# Response red * (k + 1) + white of guess against every column of codes
+def score_codes(codes, guess, k):
+    red, white = mastermind_filter.score_all(codes, guess)
+    return red.astype(np.uint16) * (k + 1) + white
+
+
+# table[g, c] is the response code of guess g against code c
+def score_table(n, k):
+    if (n, k) in tables:
+        return tables[(n, k)]
+    path = os.path.join(CACHE_DIR, "score_{}_{}.npy".format(n, k))
+    if os.path.exists(path):
+        table = np.load(path, mmap_mode="r")
+    else:
+        codes = mastermind_filter.code_space(n, k)
+        table = np.empty((codes.shape[1], codes.shape[1]), dtype=np.uint8)
+        for g in range(codes.shape[1]):
+            table[g] = score_codes(codes, codes[:, g], k)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = path + ".{}.tmp".format(os.getpid())
+            with open(tmp, "wb") as f:
+                np.save(f, table)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    tables[(n, k)] = table
+    return table
+
+
+# Pick the guess splitting the candidate indices alive best. criterion is
+# "minimax" (smallest largest part) or "expected" (smallest expected part);
+# ties go to guesses that could still be the code, then to the lowest index.
+def choose_guess(codes, alive, n, k, criterion="minimax", rng=None):
+    if len(alive) <= 2:
+        return int(alive[0])
+    responses = (k + 1) * (k + 1)
+    if n ** k <= TABLE_LIMIT:
+        guesses = np.arange(codes.shape[1])
+        scores = np.asarray(score_table(n, k))[:, alive]
+    else:
+        rng = rng or np.random.default_rng(0)
+        if len(alive) > SAMPLES:
+            alive = np.sort(rng.choice(alive, SAMPLES, replace=False))
+        others = rng.integers(0, codes.shape[1], SAMPLES // 2)
+        guesses = np.unique(np.concatenate([alive[:SAMPLES // 2], others]))
+        sample = codes[:, alive]
+        scores = np.empty((len(guesses), len(alive)), dtype=np.uint16)
+        for j in range(len(guesses)):
+            scores[j] = score_codes(sample, codes[:, guesses[j]], k)
+    flat = scores.astype(np.int64) + responses * np.arange(len(guesses))[:, None]
+    parts = np.bincount(flat.ravel(), minlength=len(guesses) * responses).reshape(len(guesses), responses)
+    if criterion == "minimax":
+        cost = parts.max(axis=1).astype(np.float64)
+    elif criterion == "expected":
+        cost = (parts.astype(np.float64) ** 2).sum(axis=1) / len(alive)
+    else:
+        raise Exception("Unknown criterion " + str(criterion))
+    # Among equal costs prefer a guess that is itself a candidate, since it
+    # might win right away
+    order = np.lexsort((guesses, ~np.isin(guesses, alive), cost))
+    return int(guesses[order[0]])
@@ -0,0 +1,161 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from mastermind import MastermindPlayer
+
+# Session pool: plays many independent games at once, each with its own
+# MastermindPlayer, on a pool of threads or processes. Player pool: keeps
+# players for the next games built ahead of time.
+
+
+# (red, white) response of the first player, as in mastermind-harness.py
+def score(move, code):
+    reds = 0
+    for i in range(len(code)):
+        if move[i] == code[i]:
+            reds += 1
+    matched_idxs = []
+    whites_and_reds = 0
+    for i in range(len(code)):
+        for j in range(len(code)):
+            if j not in matched_idxs and move[i] == code[j]:
+                whites_and_reds += 1
+                matched_idxs.append(j)
+                break
+    return reds, whites_and_reds - reds
+
+
+# Play one game of a fresh session against code; with probability noise the
+# first player scores [0] * k instead of the move, like get_auto_response in
+# mastermind-harness.py. Returns the number of moves.
+def play_game(n, k, code, noise=0.0, seed=0, max_moves=1000, options={}):
+    rng = random.Random(seed)
+    player = MastermindPlayer(n, k, **options)
+    moves = 0
+    red = 0
+    while red < k and moves < max_moves:
+        move = player.get_second_player_move()
+        moves += 1
+        if noise > 0 and rng.random() < noise:
+            move = [0] * k
+        red, white = score(move, code)
+        player.put_first_player_response(red, white)
+    return moves
+
+
+def play_games(games):
+    return [play_game(*game) for game in games]
+
+
+# Runs games (tuples of play_game arguments) concurrently. kind is "thread"
+# (sessions share the process; each has its own z3 context) or "process".
+class SessionPool:
+    __slots__ = ("kind", "workers", "executor")
+
+    def __init__(self, workers=None, kind="thread"):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        if kind == "thread":
+            self.executor = ThreadPoolExecutor(self.workers)
+        elif kind == "process":
+            self.executor = ProcessPoolExecutor(self.workers)
+        else:
+            raise Exception("Unknown pool kind " + str(kind))
+
+    # Returns the moves of every game and the throughput of the run
+    def run(self, games, chunk=16):
+        games = list(games)
+        start = time.perf_counter()
+        chunks = [games[i:i + chunk] for i in range(0, len(games), chunk)]
+        moves = []
+        for part in self.executor.map(play_games, chunks):
+            moves.extend(part)
+        elapsed = time.perf_counter() - start
+        stats = {"games": len(games), "moves": sum(moves), "seconds": elapsed,
+                 "games_per_second": len(games) / elapsed if elapsed else 0.0,
+                 "moves_per_second": sum(moves) / elapsed if elapsed else 0.0}
+        return moves, stats
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Pre-initialized players per (n, k, options). checkout hands out a ready
+# player (building one on the spot only if none is left) and a background
+# thread builds replacements until size are ready again, so a new game
+# does not wait for its context and base constraints.
+class PlayerPool:
+    __slots__ = ("size", "ready", "lock", "executor", "refilling")
+
+    def __init__(self, size=4):
+        self.size = size
+        self.ready = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(1)
+        self.refilling = set()
+
+    def checkout(self, n, k, **options):
+        key = (n, k, tuple(sorted(options.items())))
+        with self.lock:
+            players = self.ready.setdefault(key, deque())
+            player = players.popleft() if players else None
+        if player is None:
+            player = MastermindPlayer(n, k, **options)
+        self.refill(key)
+        return player
+
+    # Build players for (n, k, options) ahead of the first game
+    def warm(self, n, k, **options):
+        self.refill((n, k, tuple(sorted(options.items()))))
+
+    def refill(self, key):
+        with self.lock:
+            players = self.ready.setdefault(key, deque())
+            if key in self.refilling or len(players) >= self.size:
+                return
+            self.refilling.add(key)
+        self.executor.submit(self.build, key)
+
+    def build(self, key):
+        n, k, options = key
+        while True:
+            with self.lock:
+                if len(self.ready[key]) >= self.size:
+                    self.refilling.discard(key)
+                    return
+            try:
+                player = MastermindPlayer(n, k, **dict(options))
+            except Exception:
+                with self.lock:
+                    self.refilling.discard(key)
+                raise
+            with self.lock:
+                self.ready[key].append(player)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Random games for benchmarking a pool
+def random_games(count, n, k, noise=0.0, seed=0, options={}):
+    rng = random.Random(seed)
+    games = []
+    for g in range(count):
+        code = [rng.randrange(n) for i in range(k)]
+        games.append((n, k, code, noise, rng.randrange(1 << 30), 1000, options))
+    return games
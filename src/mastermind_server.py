@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+
+# asyncio game server for the second player: line-delimited JSON over TCP or
+# a Unix socket, one MastermindPlayer per session, e.g.
+#   ./mastermind_server.py serve --port 7777
+#   ./mastermind_server.py load --port 7777 --clients 50 --games 500
+#
+# requests (an optional "id" is echoed back in the reply):
+#   {"op": "new", "n": 8, "k": 4, "options": {...}}  -> {"ok": true, "session": 1}
+#     (new sessions get a player from a warm PlayerPool)
+#   {"op": "move", "session": 1}                     -> {"ok": true, "move": [0, 0, 0, 0]}
+#   {"op": "response", "session": 1, "red": 1, "white": 2}
+#   {"op": "close", "session": 1}
+#   {"op": "stats"}                                  -> per-op latency metrics
+# errors come back as {"ok": false, "error": "..."}
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from mastermind_pool import PlayerPool, score
+
+
+# Nearest-rank percentiles of a list of latencies
+def percentiles(values, points=(50, 95, 99)):
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        if ordered:
+            result["p{}".format(p)] = ordered[min(len(ordered) - 1, (len(ordered) * p) // 100)]
+        else:
+            result["p{}".format(p)] = None
+    return result
+
+
+# Latencies of the last window requests of each op
+class Metrics:
+    __slots__ = ("window", "latencies", "counts")
+
+    def __init__(self, window=10000):
+        self.window = window
+        self.latencies = {}
+        self.counts = {}
+
+    def record(self, op, seconds):
+        if op not in self.latencies:
+            self.latencies[op] = deque(maxlen=self.window)
+            self.counts[op] = 0
+        self.latencies[op].append(seconds)
+        self.counts[op] += 1
+
+    def summary(self):
+        result = {}
+        for op in self.latencies:
+            values = list(self.latencies[op])
+            row = {"count": self.counts[op], "mean": sum(values) / len(values), "max": max(values)}
+            row.update(percentiles(values))
+            result[op] = row
+        return result
+
+
+class Session:
+    __slots__ = ("player", "lock")
+
+    def __init__(self, player):
+        self.player = player
+        # One solver call at a time per session
+        self.lock = asyncio.Lock()
+
+
+# Solver work runs on a thread pool so a slow check() only holds up its own
+# session. At most max_inflight calls are queued on the pool at once; a
+# connection sends its next request only after the reply to the previous one
+# has been written and drained, so slow clients cannot pile up work either.
+class GameServer:
+    __slots__ = ("sessions", "ids", "executor", "inflight", "metrics", "players")
+
+    def __init__(self, workers=None, max_inflight=None, pool_size=4):
+        workers = workers or os.cpu_count() or 1
+        self.players = PlayerPool(pool_size)
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.executor = ThreadPoolExecutor(workers)
+        self.inflight = asyncio.Semaphore(max_inflight or 4 * workers)
+        self.metrics = Metrics()
+
+    async def offload(self, fn, *args):
+        async with self.inflight:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def handle(self, request):
+        op = request.get("op")
+        if op == "new":
+            options = request.get("options", {})
+            player = await self.offload(lambda: self.players.checkout(request["n"], request["k"], **options))
+            session = next(self.ids)
+            self.sessions[session] = Session(player)
+            return {"session": session}
+        if op == "stats":
+            return {"sessions": len(self.sessions), "latency": self.metrics.summary()}
+        if request.get("session") not in self.sessions:
+            raise Exception("Unknown session")
+        session = self.sessions[request["session"]]
+        if op == "move":
+            async with session.lock:
+                move = await self.offload(session.player.get_second_player_move)
+            return {"move": move}
+        if op == "response":
+            async with session.lock:
+                await self.offload(session.player.put_first_player_response,
+                                   request["red"], request["white"])
+            return {}
+        if op == "close":
+            del self.sessions[request["session"]]
+            return {}
+        raise Exception("Unknown op " + str(op))
+
+    # Sessions opened on a connection and not closed on it are dropped when
+    # it goes away, so clients that disconnect mid-game leak no players
+    async def serve_connection(self, reader, writer):
+        opened = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter()
+                op = None
+                request = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise Exception("Request must be a JSON object")
+                    op = request.get("op")
+                    reply = await self.handle(request)
+                    reply["ok"] = True
+                    if op == "new":
+                        opened.add(reply["session"])
+                    elif op == "close":
+                        opened.discard(request["session"])
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e)}
+                if "id" in request:
+                    reply["id"] = request["id"]
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+                self.metrics.record(op if reply["ok"] else "error", time.perf_counter() - start)
+        except ConnectionError:
+            pass
+        finally:
+            for session in opened:
+                self.sessions.pop(session, None)
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=7777, path=None):
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve_connection, path)
+        return await asyncio.start_server(self.serve_connection, host, port)
+
+
+async def serve(host, port, path, workers, max_inflight, pool_size):
+    server = GameServer(workers, max_inflight, pool_size)
+    listener = await server.start(host, port, path)
+    async with listener:
+        await listener.serve_forever()
+
+
+async def connect(host, port, path):
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+# One load-generator client: plays games back to back over one connection,
+# scoring the moves itself (with the harness's lie model at rate noise)
+async def load_client(host, port, path, games, n, k, noise, seed, latencies):
+    reader, writer = await connect(host, port, path)
+    rng = random.Random(seed)
+
+    async def call(request):
+        start = time.perf_counter()
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        if not reply["ok"]:
+            raise Exception(reply["error"])
+        return reply
+
+    moves = 0
+    for g in range(games):
+        code = [rng.randrange(n) for i in range(k)]
+        session = (await call({"op": "new", "n": n, "k": k}))["session"]
+        red = 0
+        while red < k:
+            move = (await call({"op": "move", "session": session}))["move"]
+            moves += 1
+            if noise > 0 and rng.random() < noise:
+                move = [0] * k
+            red, white = score(move, code)
+            await call({"op": "response", "session": session, "red": red, "white": white})
+        await call({"op": "close", "session": session})
+    writer.close()
+    return moves
+
+
+async def load(host, port, path, clients, games, n, k, noise, seed):
+    latencies = []
+    start = time.perf_counter()
+    per_client = [games // clients + (1 if c < games % clients else 0) for c in range(clients)]
+    moves = await asyncio.gather(*[load_client(host, port, path, per_client[c], n, k, noise,
+                                               seed + c, latencies) for c in range(clients)])
+    elapsed = time.perf_counter() - start
+    report = {"games": games, "moves": sum(moves), "seconds": elapsed,
+              "games_per_second": games / elapsed, "requests": len(latencies),
+              "requests_per_second": len(latencies) / elapsed}
+    report.update(percentiles(latencies))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mastermind second-player game server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "load"):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=7777)
+        p.add_argument("--unix", default=None, help="Unix socket path instead of TCP")
+    serve_args = sub.choices["serve"]
+    serve_args.add_argument("--workers", type=int, default=None)
+    serve_args.add_argument("--max-inflight", type=int, default=None)
+    serve_args.add_argument("--pool-size", type=int, default=4, help="players kept ready per (n, k, options)")
+    load_args = sub.choices["load"]
+    load_args.add_argument("--clients", type=int, default=10)
+    load_args.add_argument("--games", type=int, default=100)
+    load_args.add_argument("--n", type=int, default=8)
+    load_args.add_argument("--k", type=int, default=4)
+    load_args.add_argument("--noise", type=float, default=0.0)
+    load_args.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.max_inflight, args.pool_size))
+    else:
+        report = asyncio.run(load(args.host, args.port, args.unix, args.clients, args.games,
+                                  args.n, args.k, args.noise, args.seed))
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+
+# regression check for the graph reduction in disconnect.py: the cut found
+# on the reduced graph must have the size of the one found without it and
+# must disconnect s from t in the input graph, e.g.
+#   ./test_reduce.py --trials 2000 --seed 1
+
+import argparse
+import random
+from collections import deque
+import disconnect
+
+
+# Whether t is still reachable from s once the edges in cut are deleted
+# (parallel edges are deleted once per copy in cut)
+def connected(edges, cut, s, t):
+    left = {}
+    for e in cut:
+        left[e] = left.get(e, 0) + 1
+    adj = {}
+    for e in edges:
+        if left.get(e, 0) > 0:
+            left[e] -= 1
+            continue
+        adj.setdefault(e[0], []).append(e[1])
+        adj.setdefault(e[1], []).append(e[0])
+    seen = {s}
+    queue = deque([s])
+    while queue:
+        x = queue.popleft()
+        for y in adj.get(x, []):
+            if y not in seen:
+                seen.add(y)
+                queue.append(y)
+    return t in seen
+
+
+def check(edges, s, t):
+    num, cut = disconnect.find_minimal_cut(edges, s, t)
+    plain, _ = disconnect.find_minimal_cut(edges, s, t, reduce=False)
+    if num != plain:
+        raise Exception("Reduced cut {} != {} on {} from {} to {}".format(num, plain, edges, s, t))
+    if sum(e[2] if len(e) == 3 else 1 for e in cut) != num:
+        raise Exception("Cut edges do not add up to {} on {}".format(num, edges))
+    if num > 0 and connected(edges, cut, s, t):
+        raise Exception("Cut {} leaves {} connected to {} on {}".format(cut, s, t, edges))
+
+
+# Small random multigraphs, half of them weighted, with many chains and
+# dangling vertices so the reduction rounds actually run
+def test_random(trials=500, seed=0):
+    rng = random.Random(seed)
+    for trial in range(trials):
+        n = rng.randint(2, 14)
+        weighted = rng.random() < 0.5
+        edges = []
+        for j in range(rng.randint(1, 30)):
+            u = rng.randrange(n)
+            v = rng.randrange(n) if rng.random() < 0.7 else (u + 1) % n
+            edges.append((u, v, rng.randint(1, 4)) if weighted else (u, v))
+        s, t = rng.sample(range(n), 2)
+        ends = {x for e in edges for x in e[:2]}
+        if s in ends and t in ends:
+            check(edges, s, t)
+
+
+# A dense core with long chains and trees hanging off it: reduced, not
+# skipped
+def test_chains(seed=0):
+    rng = random.Random(seed)
+    n = 200
+    edges = [(rng.randrange(n), rng.randrange(n)) for j in range(600)]
+    label = n
+    for c in range(300):
+        prev = rng.randrange(n)
+        for j in range(4):
+            edges.append((prev, label))
+            prev = label
+            label += 1
+        if c % 2:
+            edges.append((prev, rng.randrange(n)))
+    g = disconnect.build_graph(edges)
+    h, origin, stats = disconnect.reduce_graph(g, g.index[edges[0][0]], g.index[edges[1][1]])
+    if h is g or stats["contracted"] == 0:
+        raise Exception("Chains were not reduced: {}".format(stats))
+    check(edges, edges[0][0], edges[1][1])
+
+
+# A star and a well connected random graph: both left as they are
+def test_skipped():
+    star = [(0, i) for i in range(1, 2001)] + [(1, 2), (2, 3)]
+    check(star, 1, 3)
+    rng = random.Random(0)
+    dense = [(rng.randrange(100), rng.randrange(100)) for j in range(1000)]
+    g = disconnect.build_graph(dense)
+    h, origin, stats = disconnect.reduce_graph(g, g.index[dense[0][0]], g.index[dense[1][1]])
+    if h is not g:
+        raise Exception("Reduced a graph without low-degree vertices: {}".format(stats))
+    check(dense, dense[0][0], dense[1][1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reduced against plain minimal cuts")
+    parser.add_argument("--trials", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    test_random(args.trials, args.seed)
+    test_chains(args.seed)
+    test_skipped()
+    print("Reduced and plain cuts agree")